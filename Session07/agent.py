@@ -97,6 +97,8 @@ async def main(user_input: str):
                                     break
 
                                 step += 1
+
+                            memory.save()  # flush items added since the last periodic save
                         except Exception as e:
                             print(f"[agent] Session initialization error: {str(e)}")
                 except Exception as e:
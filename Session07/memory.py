@@ -1,17 +1,26 @@
 # memory.py
 
+import os
+import json
+import time
 import numpy as np
 import faiss
 import requests
-from typing import List, Optional, Literal
-from pydantic import BaseModel
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Literal
+from pydantic import BaseModel, Field
 from datetime import datetime
 
+MEMORY_DIR = Path(__file__).parent / "memory_index"
+EMBED_BATCH_SIZE = 64         # texts per /api/embed request
+PERSIST_EVERY_ITEMS = 20      # save after this many unsaved items...
+PERSIST_EVERY_SECONDS = 30.0  # ...or when the last save is this old
+
 
 class MemoryItem(BaseModel):
     text: str
     type: Literal["preference", "tool_output", "fact", "query", "system"] = "fact"
-    timestamp: Optional[str] = datetime.now().isoformat()
+    timestamp: Optional[str] = Field(default_factory=lambda: datetime.now().isoformat())
     tool_name: Optional[str] = None
     user_query: Optional[str] = None
     tags: List[str] = []
@@ -19,12 +28,45 @@ class MemoryItem(BaseModel):
 
 
 class MemoryManager:
-    def __init__(self, embedding_model_url="http://localhost:11434/api/embeddings", model_name="nomic-embed-text"):
+    """
+    FAISS-backed memory. Vector i in `index` belongs to `data[i]`; the vectors themselves
+    live only in FAISS. Every item is also added to a sub-index for its type and one for
+    its session, so type/session filters search only matching items.
+
+    With `persist_dir`, items (items.jsonl, append-only) and the index (index.bin) are
+    saved every PERSIST_EVERY_ITEMS items or PERSIST_EVERY_SECONDS, and by save(). They
+    are reloaded at startup without any embedding calls, unless the index has to be
+    rebuilt; the saved files are only replaced once a rebuild has succeeded.
+    """
+
+    def __init__(self, embedding_model_url="http://localhost:11434/api/embeddings", model_name="nomic-embed-text", persist_dir: Optional[Path] = MEMORY_DIR):
         self.embedding_model_url = embedding_model_url
+        self.embed_batch_url = embedding_model_url.rsplit("/api/", 1)[0] + "/api/embed"
         self.model_name = model_name
+        self.persist_dir = Path(persist_dir) if persist_dir else None
         self.index = None
         self.data: List[MemoryItem] = []
-        self.embeddings: List[np.ndarray] = []
+        self.sub_indexes: Dict[tuple, faiss.IndexIDMap2] = {}  # ("type", "fact") / ("session", id) -> vectors with ids into data
+        self._saved_items = 0
+        self._saved_at = time.monotonic()
+        if self.persist_dir:
+            self.load()
+
+    # ── embeddings ───────────────────────────────────────────────
+    def _get_embeddings(self, texts: List[str]) -> np.ndarray:
+        """L2-normalized embeddings, one request per EMBED_BATCH_SIZE texts."""
+        batches = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            batch = texts[start:start + EMBED_BATCH_SIZE]
+            response = requests.post(self.embed_batch_url, json={"model": self.model_name, "input": batch})
+            if response.status_code == 404:  # Ollama before /api/embed: one request per text
+                vectors = np.stack([self._get_embedding(text) for text in batch])
+                faiss.normalize_L2(vectors)   # /api/embed returns normalized vectors
+            else:
+                response.raise_for_status()
+                vectors = np.array(response.json()["embeddings"], dtype=np.float32)
+            batches.append(vectors)
+        return np.concatenate(batches)
 
     def _get_embedding(self, text: str) -> np.ndarray:
         response = requests.post(
@@ -34,16 +76,36 @@ class MemoryManager:
         response.raise_for_status()
         return np.array(response.json()["embedding"], dtype=np.float32)
 
+    # ── writes ───────────────────────────────────────────────────
     def add(self, item: MemoryItem):
-        emb = self._get_embedding(item.text)
-        self.embeddings.append(emb)
-        self.data.append(item)
+        self.bulk_add([item])
 
-        # Initialize or add to index
+    def bulk_add(self, items: List[MemoryItem]):
+        """Embed all items in batched requests and add them to the index in one call."""
+        items = list(items)
+        if not items:
+            return
+        self._index_items(items, self._get_embeddings([item.text for item in items]))
+        self._maybe_save()
+
+    def _index_items(self, items: List[MemoryItem], vectors: np.ndarray):
         if self.index is None:
-            self.index = faiss.IndexFlatL2(len(emb))
-        self.index.add(np.stack([emb]))
-
+            self.index = faiss.IndexFlatL2(vectors.shape[1])
+        ids = np.arange(len(self.data), len(self.data) + len(items), dtype=np.int64)
+        self.index.add(vectors)
+        self.data.extend(items)
+
+        rows: Dict[tuple, List[int]] = {}
+        for row, item in enumerate(items):
+            rows.setdefault(("type", item.type), []).append(row)
+            if item.session_id:
+                rows.setdefault(("session", item.session_id), []).append(row)
+        for key, members in rows.items():
+            if key not in self.sub_indexes:
+                self.sub_indexes[key] = faiss.IndexIDMap2(faiss.IndexFlatL2(self.index.d))
+            self.sub_indexes[key].add_with_ids(vectors[members], ids[members])
+
+    # ── reads ────────────────────────────────────────────────────
     def retrieve(
         self,
         query: str,
@@ -55,33 +117,105 @@ class MemoryManager:
         if not self.index or len(self.data) == 0:
             return []
 
-        query_vec = self._get_embedding(query).reshape(1, -1)
-        D, I = self.index.search(query_vec, top_k * 2)  # Overfetch to allow filtering
-
-        results = []
-        for idx in I[0]:
-            if idx >= len(self.data):
-                continue
-            item = self.data[idx]
-
-            # Filter by type
-            if type_filter and item.type != type_filter:
-                continue
-
-            # Filter by tags
-            if tag_filter and not any(tag in item.tags for tag in tag_filter):
-                continue
-
-            # Filter by session
-            if session_filter and item.session_id != session_filter:
-                continue
-
-            results.append(item)
-            if len(results) >= top_k:
-                break
-
-        return results
-
-    def bulk_add(self, items: List[MemoryItem]):
-        for item in items:
-            self.add(item)
+        # Search the smallest index that only holds items passing the type/session filters
+        keys = [key for key in (("type", type_filter), ("session", session_filter)) if key[1]]
+        if any(key not in self.sub_indexes for key in keys):
+            return []
+        index = min((self.sub_indexes[key] for key in keys), key=lambda sub: sub.ntotal, default=self.index)
+
+        query_vec = self._get_embeddings([query])
+        k = top_k
+        while True:
+            # Only a tag filter, or both type and session filters, can reject candidates;
+            # widen the search until top_k pass or the index is exhausted
+            k = min(k, index.ntotal)
+            D, I = index.search(query_vec, k)
+            results = [
+                self.data[idx] for idx in I[0]
+                if idx >= 0 and self._matches(self.data[idx], type_filter, tag_filter, session_filter)
+            ]
+            if len(results) >= top_k or k >= index.ntotal:
+                return results[:top_k]
+            k *= 2
+
+    @staticmethod
+    def _matches(item: MemoryItem, type_filter, tag_filter, session_filter) -> bool:
+        if type_filter and item.type != type_filter:
+            return False
+        if tag_filter and not any(tag in item.tags for tag in tag_filter):
+            return False
+        if session_filter and item.session_id != session_filter:
+            return False
+        return True
+
+    # ── persistence ──────────────────────────────────────────────
+    def _maybe_save(self):
+        unsaved = len(self.data) - self._saved_items
+        if self.persist_dir and unsaved and (
+            unsaved >= PERSIST_EVERY_ITEMS or time.monotonic() - self._saved_at >= PERSIST_EVERY_SECONDS
+        ):
+            self.save()
+
+    def save(self, rewrite: bool = False):
+        """
+        Append unsaved items to items.jsonl, then replace index.bin and meta.json atomically.
+        With `rewrite`, items.jsonl is replaced by all items as well (after a rebuild).
+        """
+        if not self.persist_dir or self.index is None:
+            return
+        self.persist_dir.mkdir(parents=True, exist_ok=True)
+        if rewrite:
+            lines = "".join(item.model_dump_json() + "\n" for item in self.data)
+            self._replace("items.jsonl", lambda tmp: tmp.write_text(lines, encoding="utf-8"))
+        else:
+            with open(self.persist_dir / "items.jsonl", "a", encoding="utf-8") as f:
+                for item in self.data[self._saved_items:]:
+                    f.write(item.model_dump_json() + "\n")
+
+        self._replace("index.bin", lambda tmp: faiss.write_index(self.index, str(tmp)))
+        meta = {"model_name": self.model_name, "dim": self.index.d, "count": len(self.data)}
+        self._replace("meta.json", lambda tmp: tmp.write_text(json.dumps(meta), encoding="utf-8"))
+
+        self._saved_items = len(self.data)
+        self._saved_at = time.monotonic()
+
+    def _replace(self, name: str, write: Callable[[Path], None]):
+        """Write a file through a temporary one, so a crash leaves the old version in place."""
+        tmp = self.persist_dir / (name + ".tmp")
+        write(tmp)
+        os.replace(tmp, self.persist_dir / name)
+
+    def load(self):
+        """
+        Restore a saved memory; vectors come from index.bin, so no embedding calls are made
+        unless the index has to be rebuilt. If that fails (e.g. Ollama is down), the error
+        propagates and the saved files are left untouched.
+        """
+        index_path = self.persist_dir / "index.bin"
+        items_path = self.persist_dir / "items.jsonl"
+        meta_path = self.persist_dir / "meta.json"
+        if not (index_path.exists() and items_path.exists()):
+            return
+
+        with open(items_path, encoding="utf-8") as f:
+            items = [MemoryItem.model_validate_json(line) for line in f if line.strip()]
+        meta = json.loads(meta_path.read_text(encoding="utf-8")) if meta_path.exists() else {}
+
+        if meta.get("model_name") != self.model_name:
+            # Vectors of another embedding model (or of an unknown one) are not comparable:
+            # embed everything again in memory, then replace the files
+            if items:
+                self._index_items(items, self._get_embeddings([item.text for item in items]))
+                self.save(rewrite=True)
+            return
+
+        index = faiss.read_index(str(index_path))
+        count = min(len(items), index.ntotal)
+        self._index_items(items[:count], index.reconstruct_n(0, count))
+        self._saved_items = count
+        if count != len(items) or count != index.ntotal:
+            # A save was interrupted between items.jsonl and index.bin: embed the items that
+            # never reached the index, then replace the files
+            if count < len(items):
+                self._index_items(items[count:], self._get_embeddings([item.text for item in items[count:]]))
+            self.save(rewrite=True)
@@ -1,11 +1,19 @@
 
 import ast
+import sys
+import copy
+import types
 import asyncio
 import time
 import builtins
+import functools
+import importlib
 import textwrap
 import re
+from collections import defaultdict
 from datetime import datetime
+from agent.tracing import annotate, span
+from mcp_servers.blob_store import preview, read_blob, resolve, use_session
 
 # ───────────────────────────────────────────────────────────────
 # CONFIG
@@ -13,8 +21,13 @@ from datetime import datetime
 ALLOWED_MODULES = {
     "math", "cmath", "decimal", "fractions", "random", "statistics", "itertools", "functools", "operator", "string", "re", "datetime", "calendar", "time", "collections", "heapq", "bisect", "types", "copy", "enum", "uuid", "dataclasses", "typing", "pprint", "json", "base64", "hashlib", "hmac", "secrets", "struct", "zlib", "gzip", "bz2", "lzma", "io", "pathlib", "tempfile", "textwrap", "difflib", "unicodedata", "html", "html.parser", "xml", "xml.etree.ElementTree", "csv", "sqlite3", "contextlib", "traceback", "ast", "tokenize", "token", "builtins"
 }
-MAX_FUNCTIONS = 5
-TIMEOUT_PER_FUNCTION = 500  # seconds
+SAFE_BUILTINS = ("range", "len", "int", "float", "str", "list", "dict", "print", "sum", "__import__")
+MAX_TOOL_CALLS = 5      # MCP tool calls per step; plain Python calls are free
+TOOL_CALL_TIMEOUT = 60  # seconds per MCP tool call
+STEP_TIMEOUT = 180      # seconds of wall clock per step, tool calls included
+GATHER_NAME = "__gather_tools__"    # sandbox names ToolCallBatcher emits for concurrent tool calls:
+BATCH_RESULTS = "__tool_batch__"    # results (or exceptions) of the last batch, in program order
+BATCH_VALUE = "__tool_result__"     # returns one result, raising it if the call failed
 
 class KeywordStripper(ast.NodeTransformer):
     """Rewrite all function calls to remove keyword args and keep only values as positional."""
@@ -41,24 +54,186 @@ class AwaitTransformer(ast.NodeTransformer):
             return ast.Await(value=node)
         return node
 
+# ───────────────────────────────────────────────────────────────
+# AST TRANSFORMER: run independent consecutive tool calls concurrently
+# ───────────────────────────────────────────────────────────────
+class ToolCallBatcher(ast.NodeTransformer):
+    """
+    After AwaitTransformer, merges runs of consecutive statements of the form
+    `x = await tool(...)` or `await tool(...)` into
+
+        __tool_batch__ = await __gather_tools__(tool(...), other(...))
+        x = __tool_result__(__tool_batch__, 0)
+        y = __tool_result__(__tool_batch__, 1)
+
+    as long as no call in the run reads a name bound earlier in the same run. Results are
+    bound in program order and the first failed call raises at its own statement, so
+    names bound before it keep their values, as in the sequential version.
+
+    Not equivalent in one respect: every call in a batch starts (and counts against the
+    step budget) even if an earlier one fails, and all arguments of the batch are
+    evaluated before the first call starts.
+    """
+    def __init__(self, async_funcs):
+        self.async_funcs = async_funcs
+        self.batched = 0
+
+    def _tool_call(self, stmt):
+        """(target name or None, call) for a batchable statement, else None"""
+        if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name):
+            target, value = stmt.targets[0].id, stmt.value
+        elif isinstance(stmt, ast.Expr):
+            target, value = None, stmt.value
+        else:
+            return None
+        if not (
+            isinstance(value, ast.Await) and isinstance(value.value, ast.Call)
+            and isinstance(value.value.func, ast.Name) and value.value.func.id in self.async_funcs
+        ):
+            return None
+        call = value.value
+        # A tool call nested in the arguments must finish first; leave those sequential
+        if any(isinstance(node, (ast.Await, ast.NamedExpr, ast.Yield, ast.YieldFrom)) for node in ast.walk(call)):
+            return None
+        return target, call
+
+    def _gather(self, group) -> list:
+        gathered = ast.Assign(
+            targets=[ast.Name(id=BATCH_RESULTS, ctx=ast.Store())],
+            value=ast.Await(value=ast.Call(
+                func=ast.Name(id=GATHER_NAME, ctx=ast.Load()),
+                args=[call for _, _, call in group],
+                keywords=[],
+            )),
+        )
+        statements = [ast.copy_location(gathered, group[0][0])]
+        for i, (stmt, target, _) in enumerate(group):
+            value = ast.Call(
+                func=ast.Name(id=BATCH_VALUE, ctx=ast.Load()),
+                args=[ast.Name(id=BATCH_RESULTS, ctx=ast.Load()), ast.Constant(value=i)],
+                keywords=[],
+            )
+            bind = ast.Assign(targets=[ast.Name(id=target, ctx=ast.Store())], value=value) if target else ast.Expr(value=value)
+            statements.append(ast.copy_location(bind, stmt))
+        return statements
+
+    def _batch(self, statements):
+        batched, group, bound = [], [], set()
+
+        def flush():
+            if len(group) > 1:
+                batched.extend(self._gather(group))
+                self.batched += len(group)
+            else:
+                batched.extend(stmt for stmt, _, _ in group)
+            group.clear()
+            bound.clear()
+
+        for stmt in statements:
+            tool_call = self._tool_call(stmt)
+            if tool_call is None:
+                flush()
+                batched.append(stmt)
+                continue
+            target, call = tool_call
+            if {node.id for node in ast.walk(call) if isinstance(node, ast.Name)} & bound:
+                flush()
+            group.append((stmt, target, call))
+            if target:
+                bound.add(target)
+        flush()
+        return batched
+
+    def generic_visit(self, node):
+        super().generic_visit(node)
+        for field in ("body", "orelse", "finalbody"):
+            statements = getattr(node, field, None)
+            if isinstance(statements, list) and statements and isinstance(statements[0], ast.stmt):
+                setattr(node, field, self._batch(statements))
+        return node
+
 # ───────────────────────────────────────────────────────────────
 # UTILITY FUNCTIONS
 # ───────────────────────────────────────────────────────────────
-def count_function_calls(code: str) -> int:
-    tree = ast.parse(code)
-    return sum(isinstance(node, ast.Call) for node in ast.walk(tree))
+def count_tool_calls(tree: ast.AST, tool_names: set) -> int:
+    """Call sites of MCP tools in the code; builtins like len() or str() do not count."""
+    return sum(
+        isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in tool_names
+        for node in ast.walk(tree)
+    )
+
+class LazyModule:
+    """
+    Stand-in for an allowed module inside the sandbox. The real import happens on first
+    attribute access, so a run only pays for the modules its code touches. Like
+    __import__("xml.etree.ElementTree"), it resolves to the top-level package after
+    importing every allowed submodule under it.
+    """
+    __slots__ = ("_imports", "_module")
+
+    def __init__(self, *imports: str):
+        object.__setattr__(self, "_imports", imports)
+        object.__setattr__(self, "_module", None)
+
+    def _load(self) -> types.ModuleType:
+        if self._module is None:
+            for name in self._imports:
+                importlib.import_module(name)
+            object.__setattr__(self, "_module", sys.modules[self._imports[0].partition(".")[0]])
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        if self._module is None:
+            return f"<lazy module '{self._imports[0].partition('.')[0]}'>"
+        return repr(self._module)
+
+
+def _batch_value(results: list, index: int):
+    """One result of a ToolCallBatcher batch; a failed call raises where it would have sequentially."""
+    value = results[index]
+    if isinstance(value, BaseException):
+        raise value
+    return value
+
+
+@functools.cache
+def sandbox_template() -> types.MappingProxyType:
+    """Read-only base globals shared by every run: one lazy proxy per allowed module, built once per process."""
+    by_package = defaultdict(list)
+    for module in sorted(ALLOWED_MODULES):
+        by_package[module.partition(".")[0]].append(module)
+    proxies = {package: LazyModule(*modules) for package, modules in by_package.items()}
+    return types.MappingProxyType({
+        **{module: proxies[module.partition(".")[0]] for module in ALLOWED_MODULES},
+        GATHER_NAME: functools.partial(asyncio.gather, return_exceptions=True),
+        BATCH_VALUE: _batch_value,
+    })
+
+
+@functools.cache
+def _safe_builtins() -> types.MappingProxyType:
+    return types.MappingProxyType({k: getattr(builtins, k) for k in SAFE_BUILTINS})
+
 
 def build_safe_globals(mcp_funcs: dict, multi_mcp=None) -> dict:
+    # Copied per run: user code can rebind globals and __builtins__ entries freely
     safe_globals = {
-        "__builtins__": {
-            k: getattr(builtins, k)
-            for k in ("range", "len", "int", "float", "str", "list", "dict", "print", "sum", "__import__")
-        },
+        **sandbox_template(),
+        "__builtins__": dict(_safe_builtins()),
         **mcp_funcs,
     }
 
-    for module in ALLOWED_MODULES:
-        safe_globals[module] = __import__(module)
+    # Large tool results arrive as BlobRefs; read_blob loads one, or one from an earlier step by id
+    safe_globals["read_blob"] = read_blob
 
     # Store LLM-style result
     safe_globals["final_answer"] = lambda x: safe_globals.setdefault("result_holder", x)
@@ -66,8 +241,9 @@ def build_safe_globals(mcp_funcs: dict, multi_mcp=None) -> dict:
     # Optional: add parallel execution
     if multi_mcp:
         async def parallel(*tool_calls):
+            # Through the proxies where possible, so these calls share the step budget
             coros = [
-                multi_mcp.function_wrapper(tool_name, *args)
+                mcp_funcs[tool_name](*args) if tool_name in mcp_funcs else multi_mcp.function_wrapper(tool_name, *args)
                 for tool_name, *args in tool_calls
             ]
             return await asyncio.gather(*coros)
@@ -80,31 +256,46 @@ def build_safe_globals(mcp_funcs: dict, multi_mcp=None) -> dict:
 # ───────────────────────────────────────────────────────────────
 # MAIN EXECUTOR
 # ───────────────────────────────────────────────────────────────
-async def run_user_code(code: str, multi_mcp) -> dict:
+async def run_user_code(code: str, multi_mcp, session_id: str = None) -> dict:
+    with span("executor.run_user_code") as trace, use_session(session_id):
+        result = await _run_user_code(code, multi_mcp)
+        trace.set(status=result["status"])
+        return result
+
+
+async def _run_user_code(code: str, multi_mcp) -> dict:
     start_time = time.perf_counter()
     start_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    budget = StepBudget(MAX_TOOL_CALLS, STEP_TIMEOUT, TOOL_CALL_TIMEOUT)
+    tool_calls = ToolCallCache()  # identical tool calls within this run share one MCP call
 
-    try:
-        func_count = count_function_calls(code)
-        if func_count > MAX_FUNCTIONS:
-            return {
-                "status": "error",
-                "error": f"Too many functions ({func_count} > {MAX_FUNCTIONS})",
-                "execution_time": start_timestamp,
-                "total_time": str(round(time.perf_counter() - start_time, 3))
-            }
+    def finish(status: str, **fields) -> dict:
+        return {
+            "status": status,
+            **fields,
+            "execution_time": start_timestamp,
+            "total_time": str(round(time.perf_counter() - start_time, 3)),
+            "budget": budget.as_dict(tool_calls.deduplicated),
+        }
 
+    try:
         tool_funcs = {
-            tool.name: make_tool_proxy(tool.name, multi_mcp)
+            tool.name: make_tool_proxy(tool.name, multi_mcp, tool_calls, budget)
             for tool in multi_mcp.get_all_tools()
         }
 
-        sandbox = build_safe_globals(tool_funcs, multi_mcp)
-        local_vars = {}
-
         cleaned_code = textwrap.dedent(code.strip())
         tree = ast.parse(cleaned_code)
 
+        # Cheap early rejection; calls in loops are still counted as they start
+        call_sites = count_tool_calls(tree, set(tool_funcs))
+        annotate(tool_call_sites=call_sites)
+        if call_sites > budget.max_tool_calls:
+            return finish("error", error=f"Too many tool calls ({call_sites} > {budget.max_tool_calls})")
+
+        sandbox = build_safe_globals(tool_funcs, multi_mcp)
+        local_vars = {}
+
         has_return = any(isinstance(node, ast.Return) for node in tree.body)
         has_result = any(
             isinstance(node, ast.Assign) and any(
@@ -117,6 +308,9 @@ async def run_user_code(code: str, multi_mcp) -> dict:
 
         tree = KeywordStripper().visit(tree) # strip "key" = "value" cases to only "value"
         tree = AwaitTransformer(set(tool_funcs)).visit(tree)
+        batcher = ToolCallBatcher(set(tool_funcs))
+        tree = batcher.visit(tree)
+        annotate(batched_calls=batcher.batched)
         ast.fix_missing_locations(tree)
 
         func_def = ast.AsyncFunctionDef(
@@ -132,65 +326,119 @@ async def run_user_code(code: str, multi_mcp) -> dict:
         exec(compiled, sandbox, local_vars)
 
         try:
-            timeout = max(3, func_count * TIMEOUT_PER_FUNCTION)  # minimum 3s even for plain returns
-            returned = await asyncio.wait_for(local_vars["__main"](), timeout=timeout)
-
-            result_value = returned if returned is not None else sandbox.get("result_holder", "None")
-
-            # If result looks like tool error text, extract
-            # Handle CallToolResult errors from MCP
-            if hasattr(result_value, "isError") and getattr(result_value, "isError", False):
-                error_msg = None
-
-                try:
-                    error_msg = result_value.content[0].text.strip()
-                except Exception:
-                    error_msg = str(result_value)
+            returned = await asyncio.wait_for(local_vars["__main"](), timeout=budget.remaining())
+        except TimeoutError as e:
+            # Per-call timeouts carry a message; the step deadline from wait_for does not
+            return finish("error", error=str(e) or f"Step timed out after {budget.time_limit} seconds")
+        except Exception as e:
+            return finish("error", error=f"{type(e).__name__}: {str(e)}")
+        finally:
+            tool_calls.cancel_pending()
+            annotate(tool_calls=budget.tool_calls, deduplicated_calls=tool_calls.deduplicated)
 
-                return {
-                    "status": "error",
-                    "error": error_msg,
-                    "execution_time": start_timestamp,
-                    "total_time": str(round(time.perf_counter() - start_time, 3))
-                }
+        result_value = returned if returned is not None else sandbox.get("result_holder", "None")
 
-            # Else: normal success
-            return {
-                "status": "success",
-                "result": str(result_value),
-                "execution_time": start_timestamp,
-                "total_time": str(round(time.perf_counter() - start_time, 3))
-            }
+        # If result looks like tool error text, extract
+        # Handle CallToolResult errors from MCP
+        if hasattr(result_value, "isError") and getattr(result_value, "isError", False):
+            error_msg = None
 
+            try:
+                error_msg = result_value.content[0].text.strip()
+            except Exception:
+                error_msg = str(result_value)
 
-        except Exception as e:
-            return {
-                "status": "error",
-                "error": f"{type(e).__name__}: {str(e)}",
-                "execution_time": start_timestamp,
-                "total_time": str(round(time.perf_counter() - start_time, 3))
-            }
+            return finish("error", error=error_msg)
 
+        # Else: normal success
+        # Contents of large tool results are shown as their blob preview, not in full
+        return finish("success", result=str(preview(result_value, tool_calls.blobs)))
 
-    except asyncio.TimeoutError:
-        return {
-            "status": "error",
-            "error": f"Execution timed out after {func_count * TIMEOUT_PER_FUNCTION} seconds",
-            "execution_time": start_timestamp,
-            "total_time": str(round(time.perf_counter() - start_time, 3))
-        }
     except Exception as e:
-        return {
-            "status": "error",
-            "error": str(e),
-            "execution_time": start_timestamp,
-            "total_time": str(round(time.perf_counter() - start_time, 3))
-        }
+        return finish("error", error=str(e))
 
 # ───────────────────────────────────────────────────────────────
 # TOOL WRAPPER
 # ───────────────────────────────────────────────────────────────
-def make_tool_proxy(tool_name: str, mcp):
+class BudgetExceeded(Exception):
+    """Raised inside the sandbox when a step has used up its MCP tool calls."""
+
+
+class StepBudget:
+    """Wall-clock and MCP tool-call allowance of one run_user_code step."""
+    def __init__(self, max_tool_calls: int, time_limit: float, call_timeout: float):
+        self.max_tool_calls = max_tool_calls
+        self.time_limit = time_limit
+        self.call_timeout = call_timeout
+        self.started = time.perf_counter()
+        self.tool_calls = 0
+        self.timed_out_calls = 0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def remaining(self) -> float:
+        return max(0.0, self.time_limit - self.elapsed())
+
+    def start_call(self, tool_name: str) -> float:
+        """Count one MCP call; returns its timeout, never past the step deadline."""
+        if self.tool_calls >= self.max_tool_calls:
+            raise BudgetExceeded(f"{tool_name}: tool call budget of {self.max_tool_calls} per step used up")
+        self.tool_calls += 1
+        return min(self.call_timeout, self.remaining())
+
+    def as_dict(self, deduplicated: int = 0) -> dict:
+        return {
+            "tool_calls": self.tool_calls,
+            "max_tool_calls": self.max_tool_calls,
+            "deduplicated_calls": deduplicated,
+            "timed_out_calls": self.timed_out_calls,
+            "elapsed_time": round(self.elapsed(), 3),
+            "time_limit": self.time_limit,
+        }
+
+
+class ToolCallCache:
+    """Tool calls made during one run, keyed by (tool, repr(args)), so identical calls share one MCP call."""
+    def __init__(self):
+        self.tasks: dict[tuple[str, str], asyncio.Future] = {}
+        self.deduplicated = 0
+        self.blobs: dict[int, tuple] = {}  # id(content) -> (content, BlobRef) for results that came as blob handles
+
+    def cancel_pending(self):
+        """Stop calls still running when the step ends, e.g. after the step deadline."""
+        for task in self.tasks.values():
+            task.cancel()
+
+
+def make_tool_proxy(tool_name: str, mcp, calls: ToolCallCache = None, budget: StepBudget = None):
+    """
+    Sandbox function for one MCP tool. With a StepBudget, every MCP call is counted and
+    gets its own deadline. With a per-run ToolCallCache, a repeated call with the same
+    arguments awaits the first call's task and gets its own copy of the result.
+    Blob handles in results are resolved to their content, so sandbox code only sees
+    plain str/bytes/JSON values.
+    """
+    async def _call(*args):
+        if budget is None:
+            result = await mcp.function_wrapper(tool_name, *args)
+        else:
+            timeout = budget.start_call(tool_name)
+            try:
+                result = await asyncio.wait_for(mcp.function_wrapper(tool_name, *args), timeout=timeout)
+            except TimeoutError:
+                budget.timed_out_calls += 1
+                raise TimeoutError(f"{tool_name} timed out after {timeout:.1f} seconds") from None
+        return resolve(result, calls.blobs if calls is not None else None)
+
     async def _tool_fn(*args):
-        return await mcp.function_wrapper(tool_name, *args)
+        if calls is None:
+            return await _call(*args)
+        key = (tool_name, repr(args))
+        task = calls.tasks.get(key)
+        if task is None:
+            task = calls.tasks[key] = asyncio.ensure_future(_call(*args))
+            return await task
+        calls.deduplicated += 1
+        return copy.deepcopy(await task)
     return _tool_fn
\ No newline at end of file
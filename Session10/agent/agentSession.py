@@ -1,10 +1,48 @@
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, field, fields
 from typing import Any, Literal, Optional
 import uuid
 import time
 import json
 
-@dataclass
+try:
+    import orjson
+except ImportError:  # orjson is optional; stdlib json produces an equivalent document
+    orjson = None
+
+
+def encode_json(value: Any) -> bytes:
+    """
+    Compact UTF-8 JSON, using orjson when available.
+    Values that are not natively JSON-serializable are stringified.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=str)
+    return json.dumps(value, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class JsonWriter:
+    """Builds a JSON document from already-encoded fragments, joined once at the end."""
+    __slots__ = ("parts",)
+
+    def __init__(self):
+        self.parts: list[bytes] = []
+
+    def key(self, name: str, first: bool = False):
+        self.parts.append(encode_json(name) + b":" if first else b"," + encode_json(name) + b":")
+
+    def array(self, fragments):
+        self.parts.append(b"[")
+        for i, fragment in enumerate(fragments):
+            if i:
+                self.parts.append(b",")
+            self.parts.append(fragment)
+        self.parts.append(b"]")
+
+    def getvalue(self) -> bytes:
+        return b"".join(self.parts)
+
+
+@dataclass(slots=True)
 class ToolCode:
     tool_name: str
     tool_arguments: dict[str, Any]
@@ -16,7 +54,7 @@ class ToolCode:
         }
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class PerceptionSnapshot:
     entities: list[str]
     result_requirement: str
@@ -28,7 +66,10 @@ class PerceptionSnapshot:
     solution_summary: str
     confidence: str
 
-@dataclass
+    def to_dict(self):
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+@dataclass(slots=True)
 class Step:
     index: int
     description: str
@@ -42,30 +83,54 @@ class Step:
     attempts: int = 0
     was_replanned: bool = False
     parent_index: Optional[int] = None
+    _cached_dict: Optional[dict] = field(default=None, init=False, repr=False, compare=False)
+    _cached_json: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+
+    def __setattr__(self, name, value):
+        # Any field assignment invalidates the serialized forms of this step only.
+        object.__setattr__(self, name, value)
+        if name not in ("_cached_dict", "_cached_json"):
+            object.__setattr__(self, "_cached_dict", None)
+            object.__setattr__(self, "_cached_json", None)
 
     def to_dict(self):
-        return {
-            "index": self.index,
-            "description": self.description,
-            "type": self.type,
-            "code": self.code.to_dict() if self.code else None,
-            "conclusion": self.conclusion,
-            "execution_result": self.execution_result,
-            "error": self.error,
-            "perception": self.perception.__dict__ if self.perception else None,
-            "status": self.status,
-            "attempts": self.attempts,
-            "was_replanned": self.was_replanned,
-            "parent_index": self.parent_index
-        }
+        """Serialized form of the step, rebuilt only after a field has been reassigned.
+
+        The returned dict is shared between callers; treat it as read-only.
+        """
+        if self._cached_dict is None:
+            self._cached_dict = {
+                "index": self.index,
+                "description": self.description,
+                "type": self.type,
+                "code": self.code.to_dict() if self.code else None,
+                "conclusion": self.conclusion,
+                "execution_result": self.execution_result,
+                "error": self.error,
+                "perception": self.perception.to_dict() if self.perception else None,
+                "status": self.status,
+                "attempts": self.attempts,
+                "was_replanned": self.was_replanned,
+                "parent_index": self.parent_index
+            }
+        return self._cached_dict
+
+    def to_json_bytes(self) -> bytes:
+        """to_dict() encoded with encode_json, cached the same way."""
+        if self._cached_json is None:
+            self._cached_json = encode_json(self.to_dict())
+        return self._cached_json
 
 
 class AgentSession:
+    __slots__ = ("session_id", "original_query", "perception", "plan_versions", "state", "_plan_text_json")
+
     def __init__(self, session_id: str, original_query: str):
         self.session_id = session_id
         self.original_query = original_query
         self.perception: Optional[PerceptionSnapshot] = None
         self.plan_versions: list[dict[str, Any]] = []
+        self._plan_text_json: list[bytes] = []  # encoded plan_text of each plan version
         self.state = {
             "original_goal_achieved": False,
             "final_answer": None,
@@ -84,6 +149,7 @@ class AgentSession:
             "steps": steps.copy()
         }
         self.plan_versions.append(plan)
+        self._plan_text_json.append(encode_json(plan_texts))
         return steps[0] if steps else None  # ✅ fix: return first Step
 
     def get_next_step_index(self) -> int:
@@ -94,23 +160,69 @@ class AgentSession:
         return {
             "session_id": self.session_id,
             "original_query": self.original_query,
-            "perception": asdict(self.perception) if self.perception else None,
+            "perception": self.perception.to_dict() if self.perception else None,
             "plan_versions": [
                 {
                     "plan_text": p["plan_text"],
-                    "steps": [asdict(s) for s in p["steps"]]
+                    "steps": [s.to_dict() for s in p["steps"]]
                 } for p in self.plan_versions
             ],
             "state_snapshot": self.get_snapshot_summary()
         }
 
+    def to_json_bytes(self, extra: Optional[dict[str, Any]] = None) -> bytes:
+        """
+        to_json() (plus `extra` fields) as compact JSON, assembled from cached fragments:
+        plan texts are encoded once and steps again only after they change, so an update
+        re-encodes the changed steps and copies bytes for the rest.
+        """
+        out = JsonWriter()
+        out.parts.append(b"{")
+        out.key("session_id", first=True)
+        out.parts.append(encode_json(self.session_id))
+        out.key("original_query")
+        out.parts.append(encode_json(self.original_query))
+        out.key("perception")
+        out.parts.append(encode_json(self.perception.to_dict() if self.perception else None))
+
+        out.key("plan_versions")
+        out.parts.append(b"[")
+        for i, (version, plan_text) in enumerate(zip(self.plan_versions, self._plan_text_json)):
+            out.parts.append(b',{"plan_text":' if i else b'{"plan_text":')
+            out.parts.append(plan_text)
+            out.key("steps")
+            out.array(s.to_json_bytes() for s in version["steps"])
+            out.parts.append(b"}")
+        out.parts.append(b"]")
+
+        out.key("state_snapshot")
+        out.parts.append(b"{")
+        out.key("session_id", first=True)
+        out.parts.append(encode_json(self.session_id))
+        out.key("query")
+        out.parts.append(encode_json(self.original_query))
+        out.key("final_plan")
+        out.parts.append(self._plan_text_json[-1] if self._plan_text_json else b"[]")
+        out.key("final_steps")
+        out.array(s.to_json_bytes() for version in self.plan_versions for s in version["steps"] if s.status == "completed")
+        for name in ("final_answer", "confidence", "reasoning_note"):
+            out.key(name)
+            out.parts.append(encode_json(self.state[name]))
+        out.parts.append(b"}")
+
+        for name, value in (extra or {}).items():
+            out.key(name)
+            out.parts.append(encode_json(value))
+        out.parts.append(b"}")
+        return out.getvalue()
+
     def get_snapshot_summary(self):
         return {
             "session_id": self.session_id,
             "query": self.original_query,
             "final_plan": self.plan_versions[-1]["plan_text"] if self.plan_versions else [],
-           "final_steps": [
-                    asdict(s)
+            "final_steps": [
+                    s.to_dict()
                     for version in self.plan_versions
                     for s in version["steps"]
                     if s.status == "completed"
@@ -139,7 +251,7 @@ class AgentSession:
 
         if self.perception:
             print("\n[Perception 0] Initial ERORLL:")
-            print(f"  {asdict(self.perception)}")
+            print(f"  {self.perception.to_dict()}")
             time.sleep(delay)
 
         for i, version in enumerate(self.plan_versions):
@@ -163,7 +275,7 @@ class AgentSession:
                     print(f"  Error: {step.error}")
                 if step.perception:
                     print("  Perception ERORLL:")
-                    for k, v in asdict(step.perception).items():
+                    for k, v in step.perception.to_dict().items():
                         print(f"    {k}: {v}")
                 print(f"  Status: {step.status}")
                 if step.was_replanned:
@@ -107,7 +107,7 @@ class AgentLoop:
                 print(step_obj.code.tool_arguments["code"])
                 code = step_obj.code.tool_arguments["code"]
                 # result = input("\nPaste result of running this code: ")
-                executor_response = await run_user_code(code, self.multi_mcp)
+                executor_response = await run_user_code(code, self.multi_mcp, session.session_id)
                 step_obj.execution_result = executor_response
                 # import pdb; pdb.set_trace()
                 # print("-"*50)
@@ -1,5 +1,6 @@
 import uuid
 import json
+import asyncio
 import datetime
 from perception.perception import Perception
 from decision.decision import Decision
@@ -8,44 +9,60 @@ from agent.agentSession import AgentSession, PerceptionSnapshot, Step, ToolCode
 from memory.session_log import live_update_session
 from memory.memory_search import MemorySearch
 from mcp_servers.multiMCP import MultiMCP
+from agent.tracing import span
 
 
 GLOBAL_PREVIOUS_FAILURE_STEPS = 3
 
 class AgentLoop:
-    def __init__(self, perception_prompt_path: str, decision_prompt_path: str, multi_mcp: MultiMCP, strategy: str = "exploratory"):
-        self.perception = Perception(perception_prompt_path)
-        self.decision = Decision(decision_prompt_path, multi_mcp)
+    def __init__(self, perception_prompt_path: str, decision_prompt_path: str, multi_mcp: MultiMCP, strategy: str = "exploratory", stream: bool = False, speculative: bool = False):
+        self.perception = Perception(perception_prompt_path, stream=stream)
+        self.decision = Decision(decision_prompt_path, multi_mcp, stream=stream)
         self.multi_mcp = multi_mcp
         self.strategy = strategy
+        # Launch the next-step decision alongside step perception, betting on local_goal_achieved
+        self.speculative = speculative
 
     async def run(self, query: str):
         session = AgentSession(session_id=str(uuid.uuid4()), original_query=query)
+        with span("agent.run", session_id=session.session_id, query=query) as trace:
+            await self._run(session, query)
+            trace.set(
+                plan_versions=len(session.plan_versions),
+                goal_achieved=bool(session.state.get("original_goal_achieved"))
+            )
+        return session
+
+    async def _run(self, session, query):
         session_memory= []
         self.log_session_start(session, query)
 
-        memory_results = self.search_memory(query)
-        perception_result = self.run_perception(query, memory_results, memory_results)
+        memory_results = await asyncio.to_thread(self.search_memory, query)
+        perception_result = await self.run_perception(query, memory_results, memory_results)
         session.add_perception(PerceptionSnapshot(**perception_result))
 
         if perception_result.get("original_goal_achieved"):
             self.handle_perception_completion(session, perception_result)
-            return session
+            return
 
-        decision_output = self.make_initial_decision(query, perception_result)
+        decision_output = await self.make_initial_decision(query, perception_result)
         step = session.add_plan_version(decision_output["plan_text"], [self.create_step(decision_output)])
         live_update_session(session)
         print(f"\n[Decision Plan Text: V{len(session.plan_versions)}]:")
         for line in session.plan_versions[-1]["plan_text"]:
             print(f"  {line}")
 
-        while step:
-            step_result = await self.execute_step(step, session, session_memory)
-            if step_result is None:
-                break  # 🔐 protect against CONCLUDE/NOP cases
-            step = self.evaluate_step(step_result, session, query)
-
-        return session
+        speculations = {}
+        try:
+            while step:
+                step_result = await self.execute_step(step, session, session_memory, speculations)
+                if step_result is None:
+                    break  # 🔐 protect against CONCLUDE/NOP cases
+                step = await self.evaluate_step(step_result, session, query, speculations.pop(step_result.index, None))
+        finally:
+            # A step that raised, or ended the session, may leave a speculation running
+            for speculation in speculations.values():
+                self.discard_speculation(speculation)
 
     def log_session_start(self, session, query):
         print("\n=== LIVE AGENT SESSION TRACE ===")
@@ -54,8 +71,10 @@ class AgentLoop:
 
     def search_memory(self, query):
         print("Searching Recent Conversation History")
-        searcher = MemorySearch()
-        results = searcher.search_memory(query)
+        with span("memory.search") as trace:
+            searcher = MemorySearch()
+            results = searcher.search_memory(query)
+            trace.set(results=len(results))
         if not results:
             print("❌ No matching memory entries found.\n")
         else:
@@ -64,7 +83,7 @@ class AgentLoop:
                 print(f"[{i}] File: {res['file']}\nQuery: {res['query']}\nResult Requirement: {res['result_requirement']}\nSummary: {res['solution_summary']}\n")
         return results
 
-    def run_perception(self, query, memory_results, session_memory=None, snapshot_type="user_query", current_plan=None):
+    async def run_perception(self, query, memory_results, session_memory=None, snapshot_type="user_query", current_plan=None):
         combined_memory = (memory_results or []) + (session_memory or [])
         perception_input = self.perception.build_perception_input(
             raw_input=query, 
@@ -72,7 +91,7 @@ class AgentLoop:
             current_plan=current_plan, 
             snapshot_type=snapshot_type
         )
-        perception_result = self.perception.run(perception_input)
+        perception_result = await self.perception.run(perception_input, on_partial=self.report_partial("Perception"))
         print("\n[Perception Result]:")
         print(json.dumps(perception_result, indent=2, ensure_ascii=False))
         return perception_result
@@ -88,16 +107,22 @@ class AgentLoop:
         })
         live_update_session(session)
 
-    def make_initial_decision(self, query, perception_result):
+    async def make_initial_decision(self, query, perception_result):
         decision_input = {
             "plan_mode": "initial",
             "planning_strategy": self.strategy,
             "original_query": query,
             "perception": perception_result
         }
-        decision_output = self.decision.run(decision_input)
+        decision_output = await self.decision.run(decision_input, on_partial=self.report_partial("Decision"))
         return decision_output
 
+    def report_partial(self, stage):
+        def on_partial(field, value):
+            preview = value if not isinstance(value, str) or len(value) <= 80 else value[:80] + "..."
+            print(f"⚡ [{stage} partial] {field}: {preview}")
+        return on_partial
+
     def create_step(self, decision_output):
         return Step(
             index=decision_output["step_index"],
@@ -107,17 +132,21 @@ class AgentLoop:
             conclusion=decision_output.get("conclusion"),
         )
 
-    async def execute_step(self, step, session, session_memory):
+    async def execute_step(self, step, session, session_memory, speculations=None):
         print(f"\n[Step {step.index}] {step.description}")
 
         if step.type == "CODE":
             print("-" * 50, "\n[EXECUTING CODE]\n", step.code.tool_arguments["code"])
-            executor_response = await run_user_code(step.code.tool_arguments["code"], self.multi_mcp)
+            executor_response = await run_user_code(step.code.tool_arguments["code"], self.multi_mcp, session.session_id)
             step.execution_result = executor_response
-            import pdb; pdb.set_trace()
             step.status = "completed"
 
-            perception_result = self.run_perception(
+            if self.speculative and speculations is not None:
+                speculation = self.speculate_next_step(session, session.original_query, step)
+                if speculation:
+                    speculations[step.index] = speculation
+
+            perception_result = await self.run_perception(
                 query=executor_response.get('result', 'Tool Failed'),
                 memory_results=session_memory,
                 current_plan=session.plan_versions[-1]["plan_text"],
@@ -144,7 +173,7 @@ class AgentLoop:
             step.execution_result = step.conclusion
             step.status = "completed"
 
-            perception_result = self.run_perception(
+            perception_result = await self.run_perception(
                 query=step.conclusion,
                 memory_results=session_memory,
                 current_plan=session.plan_versions[-1]["plan_text"],
@@ -161,25 +190,22 @@ class AgentLoop:
             live_update_session(session)
             return None
 
-    def evaluate_step(self, step, session, query):
+    async def evaluate_step(self, step, session, query, speculation=None):
         if step.perception.original_goal_achieved:
+            self.discard_speculation(speculation)
             print("\n✅ Goal achieved.")
             session.mark_complete(step.perception)
             live_update_session(session)
             return None
         elif step.perception.local_goal_achieved:
-            return self.get_next_step(session, query, step)
+            return await self.get_next_step(session, query, step, speculation)
         else:
+            self.discard_speculation(speculation)
             print("\n🔁 Step unhelpful. Replanning.")
-            decision_output = self.decision.run({
-                "plan_mode": "mid_session",
-                "planning_strategy": self.strategy,
-                "original_query": query,
-                "current_plan_version": len(session.plan_versions),
-                "current_plan": session.plan_versions[-1]["plan_text"],
-                "completed_steps": [s.to_dict() for s in session.plan_versions[-1]["steps"] if s.status == "completed"],
-                "current_step": step.to_dict()
-            })
+            decision_output = await self.decision.run(
+                self.mid_session_input(session, query, step),
+                on_partial=self.report_partial("Decision")
+            )
             step = session.add_plan_version(decision_output["plan_text"], [self.create_step(decision_output)])
 
             print(f"\n[Decision Plan Text: V{len(session.plan_versions)}]:")
@@ -188,19 +214,24 @@ class AgentLoop:
 
             return step
 
-    def get_next_step(self, session, query, step):
+    async def get_next_step(self, session, query, step, speculation=None):
         next_index = step.index + 1
         total_steps = len(session.plan_versions[-1]["plan_text"])
         if next_index < total_steps:
-            decision_output = self.decision.run({
-                "plan_mode": "mid_session",
-                "planning_strategy": self.strategy,
-                "original_query": query,
-                "current_plan_version": len(session.plan_versions),
-                "current_plan": session.plan_versions[-1]["plan_text"],
-                "completed_steps": [s.to_dict() for s in session.plan_versions[-1]["steps"] if s.status == "completed"],
-                "current_step": step.to_dict()
-            })
+            decision_output = None
+            if speculation:
+                print("\n⚡ Perception confirmed the step; using the speculative decision.")
+                try:
+                    decision_output = await speculation
+                except (Exception, asyncio.CancelledError) as e:
+                    if asyncio.current_task().cancelling():
+                        raise  # the session itself is being cancelled
+                    print(f"⚠️ Speculative decision failed ({type(e).__name__}: {e}); deciding again.")
+            if decision_output is None:
+                decision_output = await self.decision.run(
+                    self.mid_session_input(session, query, step),
+                    on_partial=self.report_partial("Decision")
+                )
             step = session.add_plan_version(decision_output["plan_text"], [self.create_step(decision_output)])
 
             print(f"\n[Decision Plan Text: V{len(session.plan_versions)}]:")
@@ -210,5 +241,40 @@ class AgentLoop:
             return step
 
         else:
+            self.discard_speculation(speculation)
             print("\n✅ No more steps.")
-            return None
\ No newline at end of file
+            return None
+
+    def mid_session_input(self, session, query, step):
+        return {
+            "plan_mode": "mid_session",
+            "planning_strategy": self.strategy,
+            "original_query": query,
+            "current_plan_version": len(session.plan_versions),
+            "current_plan": session.plan_versions[-1]["plan_text"],
+            "completed_steps": [s.to_dict() for s in session.plan_versions[-1]["steps"] if s.status == "completed"],
+            "current_step": step.to_dict()
+        }
+
+    def speculate_next_step(self, session, query, step):
+        """
+        Start the next-step decision before step perception has finished, assuming the step
+        reached its local goal. The decision input is the one get_next_step would send,
+        except the step has no perception yet. Returns None when the plan has no next step,
+        or when the code failed, since perception will then not confirm the step.
+        """
+        if step.index + 1 >= len(session.plan_versions[-1]["plan_text"]):
+            return None
+        if step.execution_result.get("status") == "error":
+            return None
+        return asyncio.create_task(self.decision.run(self.mid_session_input(session, query, step)))
+
+    def discard_speculation(self, speculation):
+        if not speculation:
+            return
+        if speculation.done():
+            if not speculation.cancelled():
+                speculation.exception()  # retrieve a failure so asyncio does not log it as unhandled
+            return
+        speculation.cancel()
+        print("🗑️ Discarded speculative decision.")
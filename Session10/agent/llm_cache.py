@@ -0,0 +1,217 @@
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+import hashlib
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+import yaml
+import numpy as np
+
+ROOT = Path(__file__).parent.parent
+PROFILE_YAML = ROOT / "config" / "profiles.yaml"
+
+DEFAULT_SETTINGS = {
+    "enabled": True,
+    "path": "memory/llm_cache.sqlite",
+    "ttl_seconds": 86400,
+    "ignore_fields": ["run_id", "timestamp", "execution_time", "total_time", "elapsed_time"],
+    "semantic_threshold": None,
+    "embedding_model": "nomic-embed-text",
+}
+
+
+def normalize_payload(payload: Any, ignore_fields: set[str]) -> Any:
+    """Drop volatile fields (run ids, timestamps, ...) at any depth so equal inputs hash equally."""
+    if isinstance(payload, dict):
+        return {k: normalize_payload(v, ignore_fields) for k, v in payload.items() if k not in ignore_fields}
+    if isinstance(payload, list):
+        return [normalize_payload(v, ignore_fields) for v in payload]
+    return payload
+
+
+class ResponseCache:
+    """
+    Persistent cache of parsed Perception/Decision outputs. Callers only use it for the
+    start of a session (user-query perception, initial plan), and only for complete answers.
+
+    Exact tier: sha256 of (kind, prompt-prefix key, normalized payload).
+    Semantic tier (optional): when `semantic_threshold` and `embed` are set, an entry whose
+    similarity text (e.g. the user query) has cosine similarity >= threshold is reused.
+    Every entry carries its own expiry.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        ttl_seconds: float,
+        ignore_fields: list[str],
+        semantic_threshold: float | None = None,
+        embed: Optional[Callable[[str], Awaitable[list[float]]]] = None,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.ignore_fields = set(ignore_fields)
+        self.semantic_threshold = semantic_threshold
+        self.embed = embed if semantic_threshold else None
+        self.hits = 0
+        self.misses = 0
+        self._vectors: dict[str, np.ndarray] = {}
+
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                prefix_key TEXT NOT NULL,
+                response TEXT NOT NULL,
+                embedding BLOB,
+                expires_at REAL NOT NULL
+            )"""
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_kind ON responses (kind, prefix_key)")
+        self.db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+        self.db.commit()
+
+    def key(self, kind: str, prefix_key: tuple, payload: Any) -> str:
+        normalized = json.dumps(normalize_payload(payload, self.ignore_fields), sort_keys=True, default=str)
+        return hashlib.sha256(f"{kind}\x00{prefix_key}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    async def get(self, kind: str, prefix_key: tuple, payload: Any, similarity_text: str | None = None) -> dict | None:
+        """
+        Cached response, or None on a miss. Best-effort: a failing lookup (sqlite error,
+        embedding service down) is logged and treated as a miss.
+        """
+        try:
+            response = await self._get(kind, prefix_key, payload, similarity_text)
+        except Exception as e:
+            print(f"⚠️ {kind} response cache lookup failed, treating as a miss: {type(e).__name__}: {e}")
+            response = None
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response
+
+    async def _get(self, kind: str, prefix_key: tuple, payload: Any, similarity_text: str | None) -> dict | None:
+        now = time.time()
+        row = await asyncio.to_thread(
+            self._fetchone,
+            "SELECT response FROM responses WHERE key = ? AND expires_at >= ?",
+            (self.key(kind, prefix_key, payload), now)
+        )
+        if row:
+            print(f"💾 {kind} response cache hit (exact)")
+            return json.loads(row[0])
+
+        if self.embed and similarity_text:
+            query_vec = await self._vector(similarity_text)
+            rows = await asyncio.to_thread(
+                self._fetchall,
+                "SELECT response, embedding FROM responses WHERE kind = ? AND prefix_key = ? AND embedding IS NOT NULL AND expires_at >= ?",
+                (kind, str(prefix_key), now)
+            )
+            best_score, best_response = 0.0, None
+            for response, blob in rows:
+                score = float(np.dot(query_vec, np.frombuffer(blob, dtype=np.float32)))
+                if score > best_score:
+                    best_score, best_response = score, response
+            if best_response is not None and best_score >= self.semantic_threshold:
+                print(f"💾 {kind} response cache hit (semantic, similarity {best_score:.3f})")
+                return json.loads(best_response)
+        return None
+
+    async def put(self, kind: str, prefix_key: tuple, payload: Any, response: dict, similarity_text: str | None = None, ttl_seconds: float | None = None):
+        """Store a response. Best-effort: a failing write is logged, never raised into the caller."""
+        try:
+            embedding = None
+            if self.embed and similarity_text:
+                embedding = (await self._vector(similarity_text)).tobytes()
+            await asyncio.to_thread(
+                self._write,
+                "INSERT OR REPLACE INTO responses (key, kind, prefix_key, response, embedding, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self.key(kind, prefix_key, payload),
+                    kind,
+                    str(prefix_key),
+                    json.dumps(response, default=str),
+                    embedding,
+                    time.time() + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds),
+                )
+            )
+        except Exception as e:
+            print(f"⚠️ {kind} response cache write failed: {type(e).__name__}: {e}")
+
+    # sqlite runs in worker threads, so the agent's event loop never waits on disk I/O
+    def _fetchone(self, sql: str, params: tuple):
+        with self._lock:
+            return self.db.execute(sql, params).fetchone()
+
+    def _fetchall(self, sql: str, params: tuple) -> list:
+        with self._lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def _write(self, sql: str, params: tuple):
+        with self._lock:
+            self.db.execute(sql, params)
+            self.db.commit()
+
+    async def _vector(self, text: str) -> np.ndarray:
+        """Unit-normalized embedding of `text`; the last few are memoized for the get/put pair."""
+        if text not in self._vectors:
+            vec = np.asarray(await self.embed(text), dtype=np.float32)
+            vec /= (np.linalg.norm(vec) or 1.0)
+            if len(self._vectors) >= 256:
+                self._vectors.pop(next(iter(self._vectors)))
+            self._vectors[text] = vec
+        return self._vectors[text]
+
+    def close(self):
+        self.db.close()
+
+
+_cache: ResponseCache | None = None
+_loaded = False
+
+
+def set_response_cache(cache: ResponseCache | None):
+    """Replace the process-wide cache (None disables caching), e.g. for an isolated benchmark run."""
+    global _cache, _loaded
+    _cache, _loaded = cache, True
+
+
+def get_response_cache() -> ResponseCache | None:
+    """Process-wide cache configured by `llm.response_cache` in profiles.yaml, or None if disabled."""
+    global _cache, _loaded
+    if _loaded:
+        return _cache
+    _loaded = True
+
+    try:
+        profile = yaml.safe_load(PROFILE_YAML.read_text()) or {}
+    except FileNotFoundError:
+        profile = {}
+    settings = {**DEFAULT_SETTINGS, **((profile.get("llm") or {}).get("response_cache") or {})}
+    if not settings["enabled"]:
+        return None
+
+    embed = None
+    if settings["semantic_threshold"]:
+        from agent.llm_gateway import get_gateway
+
+        async def embed(text: str) -> list[float]:
+            return await get_gateway().embed(text, model=settings["embedding_model"])
+
+    path = Path(settings["path"])
+    _cache = ResponseCache(
+        path if path.is_absolute() else ROOT / path,
+        ttl_seconds=settings["ttl_seconds"],
+        ignore_fields=settings["ignore_fields"],
+        semantic_threshold=settings["semantic_threshold"],
+        embed=embed,
+    )
+    return _cache
@@ -0,0 +1,338 @@
+import os
+import json
+import time
+import random
+import asyncio
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterable, Optional
+
+import yaml
+import httpx
+from dotenv import load_dotenv
+from google import genai
+from google.genai import types
+from google.genai.errors import ClientError, ServerError
+
+from agent.stream_json import stream_json_block
+from agent.tracing import annotate, span
+
+load_dotenv()
+
+ROOT = Path(__file__).parent.parent
+PROFILE_YAML = ROOT / "config" / "profiles.yaml"
+
+DEFAULT_SETTINGS = {
+    "timeout_seconds": 60,
+    "max_retries": 2,
+    "backoff_seconds": 1.0,
+    "concurrency": {"gemini": 8, "ollama": 2},
+    "ollama_url": "http://localhost:11434",
+    "ollama_keep_alive": "30m",
+    "prefix_cache_ttl_seconds": 900,
+    "prefix_cache_refresh_seconds": 120,
+}
+
+
+class LLMUnavailableError(Exception):
+    """Raised when a provider keeps failing (timeouts, 5xx, rate limits) after all retries."""
+
+
+def load_gateway_settings() -> dict:
+    """Read the `llm.gateway` block of profiles.yaml, falling back to DEFAULT_SETTINGS."""
+    try:
+        profile = yaml.safe_load(PROFILE_YAML.read_text()) or {}
+    except FileNotFoundError:
+        profile = {}
+    return {**DEFAULT_SETTINGS, **((profile.get("llm") or {}).get("gateway") or {})}
+
+
+# ───────────────────────────────────────────────────────────────
+# PROVIDERS
+# ───────────────────────────────────────────────────────────────
+class GeminiProvider:
+    def __init__(self, api_key: str | None = None):
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not self.api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment or explicitly provided.")
+        self.client = genai.Client(api_key=self.api_key)
+
+    def is_retryable(self, exc: Exception) -> bool:
+        return isinstance(exc, ServerError) or (isinstance(exc, ClientError) and exc.code == 429)
+
+    def is_prefix_rejected(self, exc: Exception) -> bool:
+        """The cached-content handle no longer exists (expired, evicted) or is not accessible."""
+        return isinstance(exc, ClientError) and exc.code in (403, 404)
+
+    async def create_prefix_cache(self, model: str, prefix: str, ttl_seconds: int) -> str:
+        cache = await self.client.aio.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(contents=[prefix], ttl=f"{ttl_seconds}s")
+        )
+        return cache.name
+
+    async def extend_prefix_cache(self, name: str, ttl_seconds: int):
+        await self.client.aio.caches.update(
+            name=name,
+            config=types.UpdateCachedContentConfig(ttl=f"{ttl_seconds}s")
+        )
+
+    def _config(self, cached_prefix: str | None):
+        return types.GenerateContentConfig(cached_content=cached_prefix) if cached_prefix else None
+
+    async def generate(self, model: str, prompt: str, cached_prefix: str | None = None, **options) -> str:
+        response = await self.client.aio.models.generate_content(
+            model=model, contents=prompt, config=self._config(cached_prefix)
+        )
+        self._annotate_usage(response)
+        try:
+            return response.text.strip()
+        except AttributeError:
+            return response.candidates[0].content.parts[0].text.strip()
+
+    async def stream(self, model: str, prompt: str, cached_prefix: str | None = None, **options) -> AsyncIterator[str]:
+        chunks = await self.client.aio.models.generate_content_stream(
+            model=model, contents=prompt, config=self._config(cached_prefix)
+        )
+        try:
+            async for chunk in chunks:
+                self._annotate_usage(chunk)
+                yield chunk.text or ""
+        finally:
+            aclose = getattr(chunks, "aclose", None)
+            if aclose:
+                await aclose()
+
+    def _annotate_usage(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            annotate(
+                prompt_tokens=usage.prompt_token_count,
+                output_tokens=usage.candidates_token_count,
+                cached_tokens=usage.cached_content_token_count
+            )
+
+    async def aclose(self):
+        aclose = getattr(self.client.aio, "aclose", None)
+        if aclose:
+            await aclose()
+
+
+class OllamaProvider:
+    """
+    Ollama has no server-side cache handles. Sending `keep_alive` keeps the model resident,
+    and the runner then reuses its KV cache for the unchanged prompt prefix between calls.
+    """
+
+    def __init__(self, base_url: str, max_connections: int, timeout: float, keep_alive: str):
+        self.keep_alive = keep_alive
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(timeout),
+        )
+
+    def is_retryable(self, exc: Exception) -> bool:
+        if isinstance(exc, httpx.TransportError):
+            return True
+        return isinstance(exc, httpx.HTTPStatusError) and (exc.response.status_code >= 500 or exc.response.status_code == 429)
+
+    async def generate(self, model: str, prompt: str, url: str | None = None, **options) -> str:
+        response = await self.client.post(
+            url or "/api/generate",
+            json={"model": model, "prompt": prompt, "stream": False, "keep_alive": self.keep_alive, **options}
+        )
+        response.raise_for_status()
+        data = response.json()
+        annotate(prompt_tokens=data.get("prompt_eval_count"), output_tokens=data.get("eval_count"))
+        return data["response"].strip()
+
+    async def stream(self, model: str, prompt: str, url: str | None = None, **options) -> AsyncIterator[str]:
+        async with self.client.stream(
+            "POST", url or "/api/generate",
+            json={"model": model, "prompt": prompt, "stream": True, "keep_alive": self.keep_alive, **options}
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                yield data.get("response", "")
+                if data.get("done"):
+                    annotate(prompt_tokens=data.get("prompt_eval_count"), output_tokens=data.get("eval_count"))
+                    break
+
+    async def embed(self, model: str, text: str) -> list[float]:
+        response = await self.client.post("/api/embeddings", json={"model": model, "prompt": text})
+        response.raise_for_status()
+        return response.json()["embedding"]
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+# ───────────────────────────────────────────────────────────────
+# GATEWAY
+# ───────────────────────────────────────────────────────────────
+class LLMGateway:
+    """
+    Single async entry point for every LLM call in the agent.
+
+    Providers are created lazily and shared, so their HTTP connection pools are reused.
+    Each provider has its own concurrency limit; every call gets a timeout and is retried
+    with exponential backoff on transient failures.
+
+    Callers with a large static prompt prefix pass it separately together with a
+    `prefix_key`. Providers that support explicit context caching get a cached-content
+    handle per (provider, model, prefix_key), extended before it expires.
+    """
+
+    def __init__(self, settings: dict | None = None):
+        self.settings = settings or load_gateway_settings()
+        self.timeout = float(self.settings["timeout_seconds"])
+        self.max_retries = int(self.settings["max_retries"])
+        self.backoff = float(self.settings["backoff_seconds"])
+        self.concurrency = dict(self.settings["concurrency"])
+        self._factories: dict[str, Callable[[], Any]] = {
+            "gemini": GeminiProvider,
+            "ollama": lambda: OllamaProvider(
+                self.settings["ollama_url"],
+                max_connections=self.concurrency.get("ollama", 2),
+                timeout=self.timeout,
+                keep_alive=self.settings["ollama_keep_alive"],
+            ),
+        }
+        self._providers: dict[str, Any] = {}
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self.prefix_ttl = int(self.settings["prefix_cache_ttl_seconds"])
+        self.prefix_refresh = int(self.settings["prefix_cache_refresh_seconds"])
+        # (provider, model, prefix_key) -> (cache name or None if uncacheable, expires_at)
+        self._prefix_handles: dict[tuple, tuple[str | None, float]] = {}
+        self._prefix_locks: defaultdict[tuple, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    def register_provider(self, name: str, provider: Any, concurrency: int | None = None):
+        """Install a provider instance (e.g. a scripted stub) under `name`."""
+        self._providers[name] = provider
+        if concurrency is not None:
+            self.concurrency[name] = concurrency
+        self._semaphores.pop(name, None)
+
+    def provider(self, name: str):
+        if name not in self._providers:
+            if name not in self._factories:
+                raise NotImplementedError(f"Unsupported model type: {name}")
+            self._providers[name] = self._factories[name]()
+        if name not in self._semaphores:
+            self._semaphores[name] = asyncio.Semaphore(self.concurrency.get(name, 4))
+        return self._providers[name]
+
+    async def generate(
+        self,
+        prompt: str,
+        *,
+        model: str,
+        provider: str = "gemini",
+        stream: bool = False,
+        watch_fields: Iterable[str] = (),
+        on_partial: Optional[Callable[[str, Any], None]] = None,
+        prefix: str | None = None,
+        prefix_key: tuple | None = None,
+        **options
+    ) -> str:
+        """
+        Return the completion text for `prefix + prompt`. With `stream=True` the generation is
+        cut off once the first ```json block closes (see agent.stream_json).
+        """
+        backend = self.provider(provider)
+        semaphore = self._semaphores[provider]
+        cache_key = (provider, model, prefix_key)
+
+        with span("llm.generate", provider=provider, model=model, stream=stream) as trace:
+            attempt = 0
+            while True:
+                cached_prefix = None
+                if prefix is not None and prefix_key is not None:
+                    cached_prefix = await self._cached_prefix(backend, cache_key, prefix)
+                contents = prompt if cached_prefix else (prefix or "") + prompt
+                call_options = {**options, "cached_prefix": cached_prefix} if cached_prefix else options
+                trace.set(attempts=attempt + 1, prefix_cached=bool(cached_prefix))
+                try:
+                    async with semaphore:
+                        async with asyncio.timeout(self.timeout):
+                            if stream:
+                                return await stream_json_block(
+                                    backend.stream(model, contents, **call_options), watch_fields, on_partial
+                                )
+                            return await backend.generate(model, contents, **call_options)
+                except Exception as e:
+                    if cached_prefix and backend.is_prefix_rejected(e):
+                        # Cache evicted or expired server-side: forget it and resend the full prompt.
+                        # Rate limits and other 4xx go through the retry/raise logic below.
+                        print(f"⚠️ Cached prefix {cached_prefix} rejected ({e}), falling back to full prompt")
+                        self._prefix_handles[cache_key] = (None, time.monotonic() + self.prefix_ttl)
+                        continue
+                    if not (isinstance(e, TimeoutError) or backend.is_retryable(e)):
+                        raise
+                    if attempt >= self.max_retries:
+                        raise LLMUnavailableError(
+                            f"{provider} unavailable after {attempt + 1} attempt(s): {type(e).__name__}: {e}"
+                        ) from e
+                    delay = self.backoff * (2 ** attempt) * (1 + random.random() / 2)
+                    print(f"⚠️ {provider} call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    attempt += 1
+
+    async def embed(self, text: str, *, model: str, provider: str = "ollama") -> list[float]:
+        """Embedding vector for `text` under the same concurrency limit and timeout as generation."""
+        backend = self.provider(provider)
+        try:
+            async with self._semaphores[provider]:
+                async with asyncio.timeout(self.timeout):
+                    return await backend.embed(model, text)
+        except Exception as e:
+            if isinstance(e, TimeoutError) or backend.is_retryable(e):
+                raise LLMUnavailableError(f"{provider} embedding unavailable: {type(e).__name__}: {e}") from e
+            raise
+
+    async def _cached_prefix(self, backend, cache_key: tuple, prefix: str) -> str | None:
+        """Cached-content handle for `prefix`, created on first use and extended before expiry."""
+        if not hasattr(backend, "create_prefix_cache"):
+            return None
+
+        async with self._prefix_locks[cache_key]:
+            name, expires_at = self._prefix_handles.get(cache_key, (None, 0.0))
+            now = time.monotonic()
+            if now < expires_at - self.prefix_refresh:
+                return name
+            try:
+                if name and now < expires_at:
+                    await backend.extend_prefix_cache(name, self.prefix_ttl)
+                else:
+                    name = await backend.create_prefix_cache(cache_key[1], prefix, self.prefix_ttl)
+                    print(f"🗄️ Cached static prompt prefix {cache_key[2]} as {name}")
+            except Exception as e:
+                # e.g. prefix below the provider's minimum cacheable size; retry after one TTL
+                print(f"⚠️ Prefix caching unavailable for {cache_key[2]}: {e}")
+                name = None
+            self._prefix_handles[cache_key] = (name, now + self.prefix_ttl)
+            return name
+
+    async def aclose(self):
+        for backend in self._providers.values():
+            aclose = getattr(backend, "aclose", None)
+            if aclose:
+                await aclose()
+        self._providers.clear()
+        self._semaphores.clear()
+        self._prefix_handles.clear()
+
+
+_gateway: LLMGateway | None = None
+
+
+def get_gateway() -> LLMGateway:
+    """Process-wide gateway shared by Perception, Decision and ModelManager."""
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway()
+    return _gateway
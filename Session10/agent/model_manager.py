@@ -1,12 +1,8 @@
 import os
 import json
 import yaml
-import requests
 from pathlib import Path
-from google import genai
-from dotenv import load_dotenv
-
-load_dotenv()
+from agent.llm_gateway import get_gateway
 
 ROOT = Path(__file__).parent.parent
 MODELS_JSON = ROOT / "config" / "models.json"
@@ -21,39 +17,19 @@ class ModelManager:
         self.model_info = self.config["models"][self.text_model_key]
         self.model_type = self.model_info["type"]
 
-        # ✅ Gemini initialization (your style)
-        if self.model_type == "gemini":
-            api_key = os.getenv("GEMINI_API_KEY")
-            self.client = genai.Client(api_key=api_key)
+        # Provider clients, pooling, timeouts and retries live in the shared gateway
+        self.gateway = get_gateway()
 
     async def generate_text(self, prompt: str) -> str:
         if self.model_type == "gemini":
-            return self._gemini_generate(prompt)
+            return await self.gateway.generate(prompt, provider="gemini", model=self.model_info["model"])
 
         elif self.model_type == "ollama":
-            return self._ollama_generate(prompt)
+            return await self.gateway.generate(
+                prompt,
+                provider="ollama",
+                model=self.model_info["model"],
+                url=self.model_info["url"]["generate"]
+            )
 
         raise NotImplementedError(f"Unsupported model type: {self.model_type}")
-
-    def _gemini_generate(self, prompt: str) -> str:
-        response = self.client.models.generate_content(
-            model=self.model_info["model"],
-            contents=prompt
-        )
-
-        # ✅ Safely extract response text
-        try:
-            return response.text.strip()
-        except AttributeError:
-            try:
-                return response.candidates[0].content.parts[0].text.strip()
-            except Exception:
-                return str(response)
-
-    def _ollama_generate(self, prompt: str) -> str:
-        response = requests.post(
-            self.model_info["url"]["generate"],
-            json={"model": self.model_info["model"], "prompt": prompt, "stream": False}
-        )
-        response.raise_for_status()
-        return response.json()["response"].strip()
@@ -0,0 +1,30 @@
+import hashlib
+from pathlib import Path
+
+
+def content_hash(text: str) -> str:
+    """Short stable digest used to key cached prompt prefixes."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class PromptTemplate:
+    """
+    A prompt file loaded once and re-read only when its mtime or size changes,
+    so editing a prompt on disk still takes effect without a restart.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.version: tuple[int, int] | None = None
+        self.digest = ""
+        self._text = ""
+
+    @property
+    def text(self) -> str:
+        stat = self.path.stat()
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self.version:
+            self._text = self.path.read_text(encoding="utf-8").strip()
+            self.digest = content_hash(self._text)
+            self.version = stamp
+        return self._text
@@ -0,0 +1,114 @@
+import json
+import re
+from typing import Any, AsyncIterator, Callable, Iterable, Optional
+
+FENCE = "```json"
+
+
+class JsonBlockStream:
+    """
+    Incrementally locate the first fenced ```json object in streamed LLM output.
+
+    Feed text chunks as they arrive; `feed()` returns the complete JSON block (as text)
+    the moment its closing brace is seen, so the caller can stop consuming the stream.
+    Watched top-level or nested fields (strings, booleans, numbers) are reported through
+    `on_partial(field, value)` as soon as their value is complete.
+    """
+
+    def __init__(self, watch_fields: Iterable[str] = (), on_partial: Optional[Callable[[str, Any], None]] = None):
+        self.text = ""
+        self.block: Optional[str] = None
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._on_partial = on_partial
+        self._pending = {
+            name: re.compile(
+                rf'"{re.escape(name)}"\s*:\s*("(?:[^"\\]|\\.)*"|true|false|null|-?\d+(?:\.\d+)?(?=\s*[,}}\]]))'
+            )
+            for name in (watch_fields if on_partial else ())
+        }
+
+    def feed(self, chunk: str) -> Optional[str]:
+        if self.block is not None or not chunk:
+            return self.block
+        self.text += chunk
+
+        if self._start is None:
+            fence_at = self.text.find(FENCE, max(0, self._pos - len(FENCE)))
+            if fence_at == -1:
+                self._pos = len(self.text)
+                return None
+            brace_at = self.text.find("{", fence_at + len(FENCE))
+            if brace_at == -1:
+                self._pos = fence_at
+                return None
+            self._start = brace_at
+            self._pos = brace_at
+
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._emit_partials(i + 1)
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                self._emit_partials(i + 1)
+                if self._depth == 0:
+                    self.block = text[self._start:i + 1]
+                    return self.block
+            elif ch == ",":
+                self._emit_partials(i + 1)
+        self._pos = len(text)
+        return None
+
+    def completed_text(self) -> str:
+        """Everything received up to the end of the JSON block, re-fenced for the existing parsers."""
+        if self.block is None:
+            return self.text
+        return f"{self.text[:self._start + len(self.block)]}\n```"
+
+    def _emit_partials(self, end: int):
+        if not self._pending:
+            return
+        window = self.text[self._start:end]
+        for name, pattern in list(self._pending.items()):
+            match = pattern.search(window)
+            if not match:
+                continue
+            del self._pending[name]
+            try:
+                value = json.loads(match.group(1))
+            except json.JSONDecodeError:
+                continue
+            self._on_partial(name, value)
+
+
+async def stream_json_block(chunks: AsyncIterator[str], watch_fields: Iterable[str] = (), on_partial: Optional[Callable[[str, Any], None]] = None) -> str:
+    """
+    Consume a streamed completion of text chunks and return the raw text up to the closing
+    brace of the first ```json block. The rest of the generation is cancelled by closing
+    the underlying stream.
+    """
+    parser = JsonBlockStream(watch_fields, on_partial)
+    try:
+        async for text in chunks:
+            if parser.feed(text) is not None:
+                break
+    finally:
+        aclose = getattr(chunks, "aclose", None)
+        if aclose:
+            await aclose()
+    return parser.completed_text().strip()
@@ -0,0 +1,305 @@
+"""
+Lightweight span tracing for the agent loop.
+
+    with span("perception.run", snapshot_type="user_query") as s:
+        ...
+        s.set(cache_hit=True)
+
+    @traced("memory.search")
+    def search_memory(...): ...
+
+Spans nest through a context variable, so asyncio tasks and asyncio.to_thread calls
+inherit the span that was current when they started. Finished spans are appended as
+JSON lines to the `tracing.path` file configured in profiles.yaml.
+
+    python -m agent.tracing summary            # p50/p95 per stage
+    python -m agent.tracing chrome -o trace.json  # open in chrome://tracing or Perfetto
+"""
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import functools
+import threading
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+import yaml
+
+ROOT = Path(__file__).parent.parent
+PROFILE_YAML = ROOT / "config" / "profiles.yaml"
+
+DEFAULT_SETTINGS = {
+    "enabled": True,
+    "path": "memory/traces/spans.jsonl",
+}
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs")
+
+    def __init__(self, name: str, trace_id: str, span_id: str, parent_id: str | None, attrs: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+_current: contextvars.ContextVar[Span | None] = contextvars.ContextVar("current_span", default=None)
+
+
+def _lane() -> str:
+    """Name of the asyncio task (or thread) a span runs on, used as its Chrome-trace row."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return task.get_name() if task else threading.current_thread().name
+
+
+class Tracer:
+    def __init__(self, path: str | Path, enabled: bool = True):
+        self.path = Path(path)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        if enabled:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Span | _NoopSpan]:
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+
+        parent = _current.get()
+        current = Span(
+            name,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex[:16],
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            attrs=attrs,
+        )
+        token = _current.set(current)
+        started_at = time.time()
+        t0 = time.perf_counter()
+        try:
+            yield current
+        except asyncio.CancelledError:
+            current.attrs["cancelled"] = True  # e.g. a discarded speculative decision
+            raise
+        except BaseException as e:
+            current.attrs["error"] = f"{type(e).__name__}: {e}"[:300]
+            raise
+        finally:
+            _current.reset(token)
+            self._export(current, started_at, time.perf_counter() - t0)
+
+    def _export(self, span: Span, started_at: float, duration: float):
+        record = {
+            "trace_id": span.trace_id,
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "name": span.name,
+            "start": round(started_at, 6),
+            "duration_ms": round(duration * 1000, 3),
+            "lane": _lane(),
+            "attrs": span.attrs,
+        }
+        line = json.dumps(record, default=str, ensure_ascii=False)
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            print(f"⚠️ Failed to write trace span: {e}")
+
+
+_tracer: Tracer | None = None
+
+
+def get_tracer() -> Tracer:
+    """Process-wide tracer configured by the `tracing` block of profiles.yaml."""
+    global _tracer
+    if _tracer is None:
+        try:
+            profile = yaml.safe_load(PROFILE_YAML.read_text()) or {}
+        except FileNotFoundError:
+            profile = {}
+        settings = {**DEFAULT_SETTINGS, **(profile.get("tracing") or {})}
+        path = Path(settings["path"])
+        _tracer = Tracer(path if path.is_absolute() else ROOT / path, enabled=bool(settings["enabled"]))
+    return _tracer
+
+
+def set_tracer(tracer: Tracer):
+    """Replace the process-wide tracer, e.g. to record a benchmark run into its own file."""
+    global _tracer
+    _tracer = tracer
+
+
+def span(name: str, **attrs):
+    """Context manager timing a block as a child of the current span."""
+    return get_tracer().span(name, **attrs)
+
+
+def annotate(**attrs):
+    """Add attributes to the innermost open span, e.g. token counts reported by a provider."""
+    current = _current.get()
+    if current is not None:
+        current.set(**attrs)
+
+
+def traced(name: str):
+    """Decorator wrapping every call of a sync or async function in a span."""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ───────────────────────────────────────────────────────────────
+# CLI: summaries and Chrome-trace export of the span log
+# ───────────────────────────────────────────────────────────────
+def load_spans(path: str | Path) -> list[dict]:
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                spans.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # partially written line
+    return spans
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of `values` (q in 0..100)."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(spans: list[dict]) -> list[dict]:
+    by_stage: dict[str, list[dict]] = defaultdict(list)
+    for s in spans:
+        by_stage[s["name"]].append(s)
+
+    rows = []
+    for name, items in by_stage.items():
+        durations = [s["duration_ms"] for s in items]
+        hits = [s["attrs"]["cache_hit"] for s in items if "cache_hit" in s["attrs"]]
+        tokens = [s["attrs"]["output_tokens"] for s in items if s["attrs"].get("output_tokens") is not None]
+        rows.append({
+            "stage": name,
+            "count": len(items),
+            "p50_ms": percentile(durations, 50),
+            "p95_ms": percentile(durations, 95),
+            "max_ms": max(durations),
+            "total_ms": sum(durations),
+            "errors": sum(1 for s in items if "error" in s["attrs"]),
+            "cache_hit_rate": sum(hits) / len(hits) if hits else None,
+            "avg_output_tokens": sum(tokens) / len(tokens) if tokens else None,
+        })
+    return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+
+def print_summary(rows: list[dict], traces: int):
+    print(f"{traces} trace(s)\n")
+    header = f"{'stage':<22}{'count':>7}{'p50 ms':>11}{'p95 ms':>11}{'max ms':>11}{'total s':>10}{'errors':>8}{'cache hit':>11}{'out tok':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        hit = f"{r['cache_hit_rate']:.0%}" if r["cache_hit_rate"] is not None else "-"
+        tok = f"{r['avg_output_tokens']:.0f}" if r["avg_output_tokens"] is not None else "-"
+        print(
+            f"{r['stage']:<22}{r['count']:>7}{r['p50_ms']:>11.1f}{r['p95_ms']:>11.1f}{r['max_ms']:>11.1f}"
+            f"{r['total_ms'] / 1000:>10.2f}{r['errors']:>8}{hit:>11}{tok:>9}"
+        )
+
+
+def to_chrome_trace(spans: list[dict]) -> dict:
+    """Chrome trace-event document: one process per trace, one thread per asyncio task/thread."""
+    pids: dict[str, int] = {}
+    tids: dict[tuple, int] = {}
+    events: list[dict[str, Any]] = []
+    for s in sorted(spans, key=lambda s: s["start"]):
+        if s["trace_id"] not in pids:
+            pids[s["trace_id"]] = pid = len(pids) + 1
+            label = s["attrs"].get("query") or s["trace_id"]
+            events.append({"ph": "M", "name": "process_name", "pid": pid, "args": {"name": str(label)[:80]}})
+        pid = pids[s["trace_id"]]
+        lane = (pid, s.get("lane", "main"))
+        if lane not in tids:
+            tids[lane] = tid = len(tids) + 1
+            events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": lane[1]}})
+        events.append({
+            "ph": "X",
+            "name": s["name"],
+            "cat": s["name"].split(".")[0],
+            "ts": s["start"] * 1e6,
+            "dur": s["duration_ms"] * 1000,
+            "pid": pid,
+            "tid": tids[lane],
+            "args": s["attrs"],
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m agent.tracing", description="Inspect agent trace spans.")
+    parser.add_argument("--path", default=None, help="span log (defaults to tracing.path in profiles.yaml)")
+    parser.add_argument("--last", type=int, default=None, help="only the N most recent traces")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("summary", help="p50/p95 latency per stage")
+    chrome = sub.add_parser("chrome", help="export to Chrome trace-event JSON")
+    chrome.add_argument("-o", "--output", default="trace.json")
+    args = parser.parse_args(argv)
+
+    path = Path(args.path) if args.path else get_tracer().path
+    if not path.exists():
+        sys.exit(f"No spans recorded yet at {path}")
+    spans = load_spans(path)
+
+    trace_ids = list(dict.fromkeys(s["trace_id"] for s in spans))
+    if args.last:
+        keep = set(trace_ids[-args.last:])
+        spans = [s for s in spans if s["trace_id"] in keep]
+        trace_ids = [t for t in trace_ids if t in keep]
+
+    if args.command == "summary":
+        print_summary(summarize(spans), len(trace_ids))
+    else:
+        Path(args.output).write_text(json.dumps(to_chrome_trace(spans)), encoding="utf-8")
+        print(f"✅ Wrote {len(spans)} span(s) from {len(trace_ids)} trace(s) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
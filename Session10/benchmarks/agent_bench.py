@@ -0,0 +1,207 @@
+"""
+Offline benchmark of AgentLoop.run: no Gemini, Ollama or network access needed.
+
+LLM calls are answered by a ScriptedLLM replaying each scenario, MCP tools run in-process
+with configurable latency, and every run happens in a scratch copy of memory/session_logs
+so the real logs are left untouched. Per-stage latency comes from the agent's own trace
+spans (agent/tracing.py).
+
+Run from Session10/:
+    python -m benchmarks.agent_bench
+    python -m benchmarks.agent_bench --scenario replan_storm --sessions 40 --concurrency 8 --stream --speculative
+    python -m benchmarks.agent_bench --replay memory/session_logs/2025/05/08/<session>.json
+    python -m benchmarks.agent_bench --output bench.json
+"""
+import os
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+from pathlib import Path
+
+from agent.agent_loop2 import AgentLoop
+from agent.llm_cache import DEFAULT_SETTINGS as CACHE_SETTINGS, ResponseCache, set_response_cache
+from agent.llm_gateway import get_gateway
+from agent.tracing import Tracer, load_spans, percentile, print_summary, set_tracer, summarize
+from benchmarks.scenarios import SCENARIOS, SESSION_LOGS
+from benchmarks.stubs import FakeMultiMCP, ReplayScript, ScriptedLLM, current_script
+
+try:
+    import psutil
+except ImportError:  # optional; only used to report process RSS
+    psutil = None
+
+ROOT = Path(__file__).parent.parent
+PERCEPTION_PROMPT = ROOT / "prompts" / "perception_prompt.txt"
+DECISION_PROMPT = ROOT / "prompts" / "decision_prompt.txt"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.agent_bench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="repeatable; default: all")
+    parser.add_argument("--replay", action="append", default=[], help="session log to replay as an extra scenario")
+    parser.add_argument("--sessions", type=int, default=20, help="timed sessions per scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="sessions in flight at once")
+    parser.add_argument("--llm-ms", type=float, default=200, help="scripted LLM time to first token")
+    parser.add_argument("--chunk-ms", type=float, default=0, help="delay between streamed chunks")
+    parser.add_argument("--spawn-ms", type=float, default=100, help="per-call MCP server spawn/handshake cost")
+    parser.add_argument("--tool-ms", type=float, default=10, help="per-call MCP tool execution time")
+    parser.add_argument("--stream", action="store_true", help="stream LLM responses")
+    parser.add_argument("--speculative", action="store_true", help="speculative next-step decisions")
+    parser.add_argument("--response-cache", choices=("off", "exact", "semantic"), default="off")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--verbose", action="store_true", help="show the agent's own output")
+    return parser.parse_args(argv)
+
+
+def build_cache(args, workdir: Path) -> ResponseCache | None:
+    if args.response_cache == "off":
+        return None
+
+    async def embed(text: str) -> list[float]:
+        return await get_gateway().embed(text, model="stub", provider="ollama")
+
+    return ResponseCache(
+        workdir / "llm_cache.sqlite",
+        ttl_seconds=CACHE_SETTINGS["ttl_seconds"],
+        ignore_fields=CACHE_SETTINGS["ignore_fields"],
+        semantic_threshold=0.95 if args.response_cache == "semantic" else None,
+        embed=embed,
+    )
+
+
+async def run_session(loop: AgentLoop, recorded: dict) -> tuple[float, bool]:
+    script = ReplayScript(recorded)
+    current_script.set(script)
+    started = time.perf_counter()
+    session = await loop.run(script.query)
+    return time.perf_counter() - started, bool(session.state.get("original_goal_achieved"))
+
+
+async def run_scenario(name: str, recorded: dict, args, workdir: Path, llm: ScriptedLLM, multi_mcp: FakeMultiMCP) -> dict:
+    # Fresh memory corpus per scenario so memory search cost does not drift between scenarios
+    logs = workdir / "memory" / "session_logs"
+    shutil.rmtree(logs, ignore_errors=True)
+    shutil.copytree(SESSION_LOGS, logs)
+
+    cache = build_cache(args, workdir / name.replace(":", "_"))
+    set_response_cache(cache)
+    loop = AgentLoop(
+        perception_prompt_path=str(PERCEPTION_PROMPT),
+        decision_prompt_path=str(DECISION_PROMPT),
+        multi_mcp=multi_mcp,
+        strategy="exploratory",
+        stream=args.stream,
+        speculative=args.speculative,
+    )
+
+    # Warm-up (imports, prompt templates, tool catalog) outside the measurement
+    set_tracer(Tracer(workdir / "untraced.jsonl", enabled=False))
+    await run_session(loop, recorded)
+
+    spans_path = workdir / f"{name.replace(':', '_')}.spans.jsonl"
+    set_tracer(Tracer(spans_path))
+    llm_calls, tool_calls = llm.calls, multi_mcp.tool_calls
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded():
+        async with semaphore:
+            return await run_session(loop, recorded)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(bounded() for _ in range(args.sessions)))
+    wall = time.perf_counter() - started
+    llm_calls, tool_calls = llm.calls - llm_calls, multi_mcp.tool_calls - tool_calls
+
+    # Memory of a single session, measured separately so tracemalloc does not skew timings
+    set_tracer(Tracer(workdir / "untraced.jsonl", enabled=False))
+    tracemalloc.start()
+    await run_session(loop, recorded)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = [r[0] * 1000 for r in results]
+    report = {
+        "sessions": args.sessions,
+        "goal_achieved": sum(1 for r in results if r[1]),
+        "wall_s": round(wall, 3),
+        "sessions_per_s": round(args.sessions / wall, 3),
+        "session_p50_ms": round(percentile(latencies, 50), 1),
+        "session_p95_ms": round(percentile(latencies, 95), 1),
+        "llm_calls_per_session": round(llm_calls / args.sessions, 2),
+        "tool_calls_per_session": round(tool_calls / args.sessions, 2),
+        "session_peak_alloc_kb": round(peak / 1024, 1),
+        "stages": summarize(load_spans(spans_path)),
+    }
+    if cache:
+        report["cache_hits"], report["cache_misses"] = cache.hits, cache.misses
+        cache.close()
+    return report
+
+
+async def main(args) -> dict:
+    scenarios = {name: SCENARIOS[name]() for name in (args.scenario or SCENARIOS)}
+    for path in args.replay:
+        scenarios[f"replay:{Path(path).stem[:8]}"] = json.loads(Path(path).read_text(encoding="utf-8"))
+
+    llm = ScriptedLLM(latency=args.llm_ms / 1000, chunk_delay=args.chunk_ms / 1000)
+    gateway = get_gateway()
+    gateway.register_provider("gemini", llm)
+    gateway.register_provider("ollama", llm)
+    multi_mcp = FakeMultiMCP(spawn_latency=args.spawn_ms / 1000, tool_latency=args.tool_ms / 1000)
+    await multi_mcp.initialize()
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "verbose")},
+        "scenarios": {},
+    }
+    home = Path.cwd()
+    with tempfile.TemporaryDirectory(prefix="agent_bench_") as tmp:
+        workdir = Path(tmp)
+        os.chdir(workdir)  # session logs and memory search resolve relative to the cwd
+        try:
+            for name, recorded in scenarios.items():
+                print(f"▶ {name}: {args.sessions} session(s), concurrency {args.concurrency}", flush=True)
+                with contextlib.ExitStack() as stack:
+                    if not args.verbose:
+                        stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+                    report["scenarios"][name] = await run_scenario(name, recorded, args, workdir, llm, multi_mcp)
+        finally:
+            os.chdir(home)
+            await gateway.aclose()
+
+    if psutil is not None:
+        report["process_rss_mb"] = round(psutil.Process().memory_info().rss / 2 ** 20, 1)
+    return report
+
+
+def print_report(report: dict):
+    for name, r in report["scenarios"].items():
+        print(f"\n=== {name} ===")
+        print(
+            f"{r['sessions']} sessions ({r['goal_achieved']} reached the goal) in {r['wall_s']}s → "
+            f"{r['sessions_per_s']} sessions/s, p50 {r['session_p50_ms']} ms, p95 {r['session_p95_ms']} ms"
+        )
+        print(
+            f"{r['llm_calls_per_session']} LLM calls and {r['tool_calls_per_session']} tool calls per session, "
+            f"peak {r['session_peak_alloc_kb']} KB allocated per session"
+        )
+        if "cache_hits" in r:
+            print(f"response cache: {r['cache_hits']} hits, {r['cache_misses']} misses")
+        print()
+        print_summary(r["stages"], r["sessions"])
+    if "process_rss_mb" in report:
+        print(f"\nProcess RSS: {report['process_rss_mb']} MB")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\n✅ Report written to {args.output}")
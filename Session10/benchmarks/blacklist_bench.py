@@ -0,0 +1,127 @@
+"""
+Micro-benchmark of the QueryHeuristics blacklist: compiled BlacklistMatcher vs the previous
+per-word loop (substring `in` for the check, str.replace per word for sanitizing).
+
+For each blacklist size and query length it reports microseconds per check and per sanitize
+for both implementations, and how often their check verdicts agree. The old sanitizer
+missed mixed-case words ("Hack", "PassWord"), so sanitized outputs are expected to differ.
+
+Run from Session10/:
+    python -m benchmarks.blacklist_bench
+    python -m benchmarks.blacklist_bench --words 10 --words 1000 --chars 200 --chars 5000 --output blacklist.json
+"""
+import json
+import random
+import string
+import timeit
+import argparse
+from pathlib import Path
+
+from heuristics.heuristics import BLACKLIST, BlacklistMatcher
+
+FILLER = (
+    "find the ascii values of characters in india and then return the sum of exponentials "
+    "what is the latest share price of ather energy summarize the dlf annual report"
+).split()
+
+
+# ───────────────────────────────────────────────────────────────
+# PREVIOUS IMPLEMENTATION (verbatim logic)
+# ───────────────────────────────────────────────────────────────
+def legacy_check(blacklist: set, query: str) -> bool:
+    query_lower = query.lower()
+    found_words = [word for word in blacklist if word in query_lower]
+    return not found_words
+
+
+def legacy_sanitize(blacklist: set, text: str) -> str:
+    sanitized = text.lower()
+    for word in blacklist:
+        if word in sanitized:
+            text = text.replace(word, 'X' * len(word))
+            text = text.replace(word.upper(), 'X' * len(word))
+    return text
+
+
+# ───────────────────────────────────────────────────────────────
+# WORKLOAD
+# ───────────────────────────────────────────────────────────────
+def make_blacklist(size: int, rng: random.Random) -> set:
+    words = set(BLACKLIST)
+    while len(words) < size:
+        words.add("".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))))
+    return words
+
+
+def make_queries(blacklist: set, chars: int, count: int, rng: random.Random) -> list[str]:
+    """Natural-ish queries; about a third contain a blacklisted word in random case."""
+    listed = sorted(blacklist)
+    queries = []
+    for i in range(count):
+        words, length = [], 0
+        while length < chars:
+            word = rng.choice(FILLER)
+            words.append(word)
+            length += len(word) + 1
+        if i % 3 == 0:
+            hit = rng.choice(listed)
+            hit = rng.choice([hit, hit.upper(), hit.capitalize()])
+            words.insert(rng.randrange(len(words) + 1), hit)
+        queries.append(" ".join(words)[:max(chars, 1)])
+    return queries
+
+
+def per_call_us(fn, queries: list[str], repeat: int) -> float:
+    def run():
+        for query in queries:
+            fn(query)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return best / len(queries) * 1e6
+
+
+def bench(size: int, chars: int, args, rng: random.Random) -> dict:
+    blacklist = make_blacklist(size, rng)
+    queries = make_queries(blacklist, chars, args.queries, rng)
+    matcher = BlacklistMatcher(blacklist)
+    matcher.pattern  # compile outside the timings; it is rebuilt only when words are added
+
+    agree = sum(legacy_check(blacklist, q) == (not matcher.found(q)) for q in queries)
+    return {
+        "words": size,
+        "chars": chars,
+        "check_legacy_us": round(per_call_us(lambda q: legacy_check(blacklist, q), queries, args.repeat), 2),
+        "check_matcher_us": round(per_call_us(matcher.found, queries, args.repeat), 2),
+        "sanitize_legacy_us": round(per_call_us(lambda q: legacy_sanitize(blacklist, q), queries, args.repeat), 2),
+        "sanitize_matcher_us": round(per_call_us(matcher.mask, queries, args.repeat), 2),
+        "check_agreement": round(agree / len(queries), 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.blacklist_bench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--words", type=int, action="append", help="blacklist size; repeatable (default: 9, 100, 1000, 5000)")
+    parser.add_argument("--chars", type=int, action="append", help="query length; repeatable (default: 100, 1000, 10000)")
+    parser.add_argument("--queries", type=int, default=200, help="queries per configuration")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repeats; the best is kept")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    rows = [bench(size, chars, args, rng) for size in (args.words or [len(BLACKLIST), 100, 1000, 5000]) for chars in (args.chars or [100, 1000, 10000])]
+
+    print(f"{'words':>6} {'chars':>6} | {'check old':>10} {'new':>9} {'x':>6} | {'sanitize old':>12} {'new':>9} {'x':>6} | agree")
+    for r in rows:
+        print(
+            f"{r['words']:>6} {r['chars']:>6} | "
+            f"{r['check_legacy_us']:>8.1f}us {r['check_matcher_us']:>7.1f}us {r['check_legacy_us'] / r['check_matcher_us']:>5.1f}x | "
+            f"{r['sanitize_legacy_us']:>10.1f}us {r['sanitize_matcher_us']:>7.1f}us {r['sanitize_legacy_us'] / r['sanitize_matcher_us']:>5.1f}x | "
+            f"{r['check_agreement']:.3f}"
+        )
+    if args.output:
+        Path(args.output).write_text(json.dumps(rows, indent=2), encoding="utf-8")
+        print(f"\n✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Retrieval benchmark for the document RAG index (mcp_servers/mcp_server_2.py).
+
+Builds FAISS indexes over mcp_servers/documents, optionally scaled up with perturbed synthetic
+copies, using a deterministic local embedder so no Ollama is needed. For each chunking mode
+and index type it reports ingest throughput, index size, query p50/p99 latency and recall@k
+against exact brute-force search over the same embeddings. The flat indexes are exact searches
+themselves, so they are the reference that recall is measured against and report no recall.
+
+Chunking modes:
+    stored      chunks of the existing faiss_index/metadata.json (semantic_merge output)
+    fixed       chunk_text() defaults: 256 words, 40 overlap
+    fixed_small 128 words, 20 overlap
+    paragraph   blank-line paragraphs packed up to 256 words
+
+Run from Session10/:
+    python -m benchmarks.rag_bench
+    python -m benchmarks.rag_bench --scale 20 --k 5 --index flat_l2 --index hnsw --output rag_report.json
+"""
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import hashlib
+from collections import defaultdict
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+try:
+    from markitdown import MarkItDown
+except ImportError:  # optional; only needed for documents missing from metadata.json
+    MarkItDown = None
+
+ROOT = Path(__file__).parent.parent
+DOC_PATH = ROOT / "mcp_servers" / "documents"
+METADATA_FILE = ROOT / "mcp_servers" / "faiss_index" / "metadata.json"
+
+# The document server imports its sibling modules top-level, as it does when MultiMCP starts it
+sys.path.insert(0, str(ROOT / "mcp_servers"))
+from mcp_server_2 import chunk_text  # noqa: E402
+
+TEXT_SUFFIXES = {".md", ".txt"}
+WORD_RE = re.compile(r"\w+")
+
+
+# ───────────────────────────────────────────────────────────────
+# CORPUS
+# ───────────────────────────────────────────────────────────────
+def load_corpus() -> dict[str, str]:
+    """
+    Document name → text. Plain-text documents are read directly; PDFs and DOCX reuse the text
+    already extracted into metadata.json (falling back to MarkItDown when available).
+    """
+    extracted = defaultdict(list)
+    if METADATA_FILE.exists():
+        for entry in json.loads(METADATA_FILE.read_text(encoding="utf-8")):
+            extracted[entry["doc"]].append(entry["chunk"])
+
+    corpus = {}
+    for file in sorted(DOC_PATH.glob("*.*")):
+        if file.suffix.lower() in TEXT_SUFFIXES:
+            corpus[file.name] = file.read_text(encoding="utf-8", errors="ignore")
+        elif file.name in extracted:
+            corpus[file.name] = "\n\n".join(extracted[file.name])
+        elif MarkItDown is not None:
+            corpus[file.name] = MarkItDown().convert(str(file)).text_content
+    return {name: text for name, text in corpus.items() if text.strip()}
+
+
+def scale_corpus(corpus: dict[str, str], scale: int, seed: int) -> dict[str, str]:
+    """Add scale-1 synthetic copies of every document with shuffled paragraphs and swapped words."""
+    rng = random.Random(seed)
+    scaled = dict(corpus)
+    vocabulary = sorted({w for text in corpus.values() for w in text.split()})
+    for copy in range(1, scale):
+        for name, text in corpus.items():
+            paragraphs = [p for p in text.split("\n\n") if p.strip()]
+            rng.shuffle(paragraphs)
+            words = "\n\n".join(paragraphs).split(" ")
+            for _ in range(len(words) // 10):
+                words[rng.randrange(len(words))] = rng.choice(vocabulary)
+            scaled[f"synthetic_{copy}/{name}"] = " ".join(words)
+    return scaled
+
+
+# ───────────────────────────────────────────────────────────────
+# CHUNKING
+# ───────────────────────────────────────────────────────────────
+def chunk_paragraphs(text: str, max_words: int = 256) -> list[str]:
+    chunks, current, count = [], [], 0
+    for paragraph in (p.strip() for p in re.split(r"\n\s*\n", text)):
+        if not paragraph:
+            continue
+        n = len(paragraph.split())
+        if current and count + n > max_words:
+            chunks.append("\n\n".join(current))
+            current, count = [], 0
+        current.append(paragraph)
+        count += n
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+CHUNKERS = {
+    "fixed": lambda text: list(chunk_text(text)),
+    "fixed_small": lambda text: list(chunk_text(text, 128, 20)),
+    "paragraph": chunk_paragraphs,
+}
+
+
+def build_chunks(mode: str, corpus: dict[str, str]) -> list[tuple[str, str]]:
+    """(document, chunk) pairs for a chunking mode."""
+    if mode == "stored":
+        stored = defaultdict(list)
+        for entry in json.loads(METADATA_FILE.read_text(encoding="utf-8")):
+            stored[entry["doc"]].append(entry["chunk"])
+        pairs = []
+        for name, text in corpus.items():
+            base = name.split("/")[-1]
+            if name == base:
+                pairs.extend((name, c) for c in stored.get(name, []))
+            else:
+                # synthetic copies have no stored chunks; split them into as many pieces as the original
+                words = text.split()
+                parts = max(1, len(stored.get(base, [])))
+                step = -(-len(words) // parts)
+                pairs.extend((name, " ".join(words[i:i + step])) for i in range(0, len(words), step))
+        return [p for p in pairs if p[1].strip()]
+    return [(name, c) for name, text in corpus.items() for c in CHUNKERS[mode](text) if c.strip()]
+
+
+# ───────────────────────────────────────────────────────────────
+# EMBEDDING
+# ───────────────────────────────────────────────────────────────
+class HashEmbedder:
+    """
+    Deterministic stand-in for nomic-embed-text: signed feature hashing of word unigrams and
+    bigrams, L2-normalized. Texts sharing vocabulary land close together, so recall numbers
+    are meaningful for comparing index types and chunkings (not for absolute quality).
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self._buckets: dict[str, tuple[int, float]] = {}
+
+    def _bucket(self, feature: str) -> tuple[int, float]:
+        if feature not in self._buckets:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            self._buckets[feature] = (int.from_bytes(digest[:4], "little") % self.dim, 1.0 if digest[4] & 1 else -1.0)
+        return self._buckets[feature]
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = WORD_RE.findall(text.lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                bucket, sign = self._bucket(feature)
+                out[row, bucket] += sign
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+# ───────────────────────────────────────────────────────────────
+# INDEXES
+# ───────────────────────────────────────────────────────────────
+def build_index(kind: str, vectors: np.ndarray, nprobe: int, ef_search: int) -> faiss.Index:
+    n, dim = vectors.shape
+    if kind == "flat_l2":  # what process_documents() builds today
+        index = faiss.IndexFlatL2(dim)
+    elif kind == "flat_ip":
+        index = faiss.IndexFlatIP(dim)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efSearch = ef_search
+    elif kind == "ivf":
+        nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))  # FAISS wants ~39 training points per list
+        index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.nprobe = min(nprobe, nlist)
+    else:
+        raise ValueError(f"Unknown index type: {kind}")
+    index.add(vectors)
+    return index
+
+
+INDEX_TYPES = ("flat_l2", "flat_ip", "hnsw", "ivf")
+# Exhaustive searches rank exactly like the brute-force baseline (the embeddings are
+# L2-normalized, so L2 and inner-product order agree); their recall is 1.0 by construction
+EXACT_INDEXES = {"flat_l2", "flat_ip"}
+
+
+def make_queries(chunks: list[tuple[str, str]], count: int, seed: int) -> list[str]:
+    """Short word windows sampled from random chunks, like a user paraphrasing a passage."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = rng.choice(chunks)[1].split()
+        length = rng.randint(5, 15)
+        start = rng.randrange(max(1, len(words) - length))
+        queries.append(" ".join(words[start:start + length]))
+    return queries
+
+
+def percentile(values: list[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def run(args) -> dict:
+    faiss.omp_set_num_threads(args.threads)
+    corpus = scale_corpus(load_corpus(), args.scale, args.seed)
+    corpus_bytes = sum(len(t.encode("utf-8")) for t in corpus.values())
+    embedder = HashEmbedder(args.dim)
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "corpus": {"documents": len(corpus), "bytes": corpus_bytes},
+        "results": [],
+    }
+
+    for mode in args.chunking or ["stored", *CHUNKERS]:
+        t0 = time.perf_counter()
+        chunks = build_chunks(mode, corpus)
+        chunk_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        vectors = embedder.embed([c for _, c in chunks])
+        embed_s = time.perf_counter() - t0
+
+        queries = make_queries(chunks, args.queries, args.seed)
+        query_vectors = embedder.embed(queries)
+        k = min(args.k, len(chunks))
+        # Brute-force baseline; results tied with the k-th best score count as correct
+        scores = query_vectors @ vectors.T
+        kth_best = -np.partition(-scores, k - 1, axis=1)[:, k - 1] - 1e-5
+
+        for kind in args.index or INDEX_TYPES:
+            t0 = time.perf_counter()
+            index = build_index(kind, vectors, args.nprobe, args.ef_search)
+            build_s = time.perf_counter() - t0
+
+            latencies, recalls = [], []
+            for qi in range(len(queries)):
+                started = time.perf_counter()
+                _, found = index.search(query_vectors[qi:qi + 1], k)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if kind not in EXACT_INDEXES:
+                    hits = [i for i in found[0] if i >= 0 and scores[qi, i] >= kth_best[qi]]
+                    recalls.append(min(len(hits), k) / k)
+
+            ingest_s = chunk_s + embed_s + build_s
+            report["results"].append({
+                "chunking": mode,
+                "index": kind,
+                "chunks": len(chunks),
+                "avg_chunk_words": round(sum(len(c.split()) for _, c in chunks) / max(1, len(chunks)), 1),
+                "ingest_s": round(ingest_s, 3),
+                "ingest_mb_per_s": round(corpus_bytes / 2 ** 20 / ingest_s, 2),
+                "ingest_chunks_per_s": round(len(chunks) / ingest_s, 1),
+                "index_build_s": round(build_s, 4),
+                "index_bytes": int(faiss.serialize_index(index).size),
+                "query_p50_ms": round(percentile(latencies, 50), 4),
+                "query_p99_ms": round(percentile(latencies, 99), 4),
+                # None marks the reference rather than a measured result
+                f"recall@{k}": round(float(np.mean(recalls)), 4) if recalls else None,
+            })
+    return report
+
+
+def print_report(report: dict):
+    print(f"Corpus: {report['corpus']['documents']} documents, {report['corpus']['bytes'] / 2 ** 20:.2f} MB\n")
+    recall_key = next((key for key in report["results"][0] if key.startswith("recall@")), None) if report["results"] else None
+    header = f"{'chunking':<12}{'index':<9}{'chunks':>8}{'ingest MB/s':>13}{'build s':>10}{'size KB':>10}{'p50 ms':>9}{'p99 ms':>9}{recall_key or 'recall':>11}"
+    print(header)
+    print("-" * len(header))
+    for r in report["results"]:
+        recall = "ref" if r[recall_key] is None else f"{r[recall_key]:.3f}"
+        print(
+            f"{r['chunking']:<12}{r['index']:<9}{r['chunks']:>8}{r['ingest_mb_per_s']:>13.2f}{r['index_build_s']:>10.3f}"
+            f"{r['index_bytes'] / 1024:>10.1f}{r['query_p50_ms']:>9.3f}{r['query_p99_ms']:>9.3f}{recall:>11}"
+        )
+    print(f"\nref: exact search, the baseline {recall_key or 'recall'} is measured against")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.rag_bench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chunking", action="append", choices=["stored", *CHUNKERS], help="repeatable; default: all")
+    parser.add_argument("--index", action="append", choices=INDEX_TYPES, help="repeatable; default: all")
+    parser.add_argument("--scale", type=int, default=1, help="corpus copies (1 = documents only)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5, help="results per query (search_stored_documents_rag uses 5)")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--nprobe", type=int, default=8, help="IVF lists probed per query")
+    parser.add_argument("--ef-search", type=int, default=64, help="HNSW search depth")
+    parser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\n✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark scenarios, each a session in memory/session_logs format that ReplayScript replays.
+
+- math_chain: three dependent math tool calls, then CONCLUDE
+- rag_lookup: recorded document RAG session (search, extract, compute log)
+- replan_storm: every web-search step fails perception and forces a replan
+"""
+import json
+from pathlib import Path
+
+from benchmarks.stubs import perception
+
+ROOT = Path(__file__).parent.parent
+SESSION_LOGS = ROOT / "memory" / "session_logs"
+
+RAG_SESSION_ID = "491cff25"
+
+
+def _step(index: int, description: str, code: str, step_perception: dict, step_type: str = "CODE", conclusion: str = "") -> dict:
+    return {
+        "index": index,
+        "description": description,
+        "type": step_type,
+        "code": {"tool_name": "raw_code_block", "tool_arguments": {"code": code}} if step_type == "CODE" else None,
+        "conclusion": conclusion,
+        "perception": step_perception,
+    }
+
+
+def load_recorded(session_prefix: str) -> dict:
+    """Recorded session whose id starts with `session_prefix`."""
+    matches = sorted(SESSION_LOGS.rglob(f"{session_prefix}*.json"))
+    if not matches:
+        raise FileNotFoundError(f"No session log matching {session_prefix}* under {SESSION_LOGS}")
+    return json.loads(matches[0].read_text(encoding="utf-8"))
+
+
+def math_chain() -> dict:
+    plan = [
+        "Step 0: Convert INDIA to ASCII values.",
+        "Step 1: Sum the exponentials of the ASCII values.",
+        "Step 2: Raise 2 to the number of characters.",
+        "Step 3: Conclude with both results.",
+    ]
+    progress = perception(local_goal_achieved=True, local_reasoning="Step produced the expected value.")
+    return {
+        "original_query": "Find the ASCII values of characters in INDIA and then return sum of exponentials of those values. Also return 2 to the power of its length.",
+        "perception": perception(
+            entities=["INDIA", "ASCII", "exponential sum"],
+            result_requirement="Sum of exponentials of the ASCII values of INDIA, and 2^5.",
+        ),
+        "plan_versions": [
+            {"plan_text": plan, "steps": [_step(0, plan[0][8:], 'result = strings_to_chars_to_int("INDIA")\nreturn result', progress)]},
+            {"plan_text": plan, "steps": [_step(1, plan[1][8:], "result = int_list_to_exponential_sum([73, 78, 68, 73, 65])\nreturn result", progress)]},
+            {"plan_text": plan, "steps": [_step(2, plan[2][8:], "result = power(2, 5)\nreturn result", progress)]},
+            {"plan_text": plan, "steps": [_step(
+                3, plan[3][8:], "", step_type="CONCLUDE",
+                conclusion="Sum of exponentials: 7.59982224609308e+33; 2^5 = 32.",
+                step_perception=perception(original_goal_achieved=True, local_goal_achieved=True, solution_summary="7.59982224609308e+33 and 32", confidence="0.95"),
+            )]},
+        ],
+    }
+
+
+def rag_lookup() -> dict:
+    return load_recorded(RAG_SESSION_ID)
+
+
+def replan_storm(replans: int = 6) -> dict:
+    failed = perception(
+        local_goal_achieved=False,
+        local_reasoning="Search results do not contain a current price.",
+        solution_summary="Not ready yet",
+    )
+    versions = []
+    for attempt in range(replans):
+        plan = [
+            f"Step 0: Search the web for the Ather Energy share price (attempt {attempt + 1}).",
+            "Step 1: Extract the price from the results.",
+        ]
+        versions.append({"plan_text": plan, "steps": [_step(
+            0, plan[0][8:], f'result = duckduckgo_search_results("Ather Energy share price attempt {attempt + 1}", 5)\nreturn result', failed
+        )]})
+    plan = ["Step 0: Conclude with the best available price."]
+    versions.append({"plan_text": plan, "steps": [_step(
+        0, plan[0][8:], "", step_type="CONCLUDE",
+        conclusion="Ather Energy last traded around Rs. 305.50 on NSE.",
+        step_perception=perception(original_goal_achieved=True, local_goal_achieved=True, solution_summary="Rs. 305.50", confidence="0.7"),
+    )]})
+    return {
+        "original_query": "What is the latest share price of Ather Energy?",
+        "perception": perception(entities=["Ather Energy", "share price"], result_requirement="Current share price of Ather Energy."),
+        "plan_versions": versions,
+    }
+
+
+SCENARIOS = {
+    "math_chain": math_chain,
+    "rag_lookup": rag_lookup,
+    "replan_storm": replan_storm,
+}
@@ -0,0 +1,270 @@
+"""
+Offline stand-ins for the agent's external dependencies:
+
+- ScriptedLLM: gateway provider that answers Perception/Decision prompts from a script
+- ReplayScript: script built from a recorded session log (memory/session_logs format)
+- FakeMultiMCP: in-process MCP tool servers with configurable spawn and tool latency
+- stub_embedding: deterministic local embedding (hashed bag of words)
+"""
+import ast
+import json
+import math
+import asyncio
+import hashlib
+import contextvars
+from collections import defaultdict
+from typing import Any, Callable
+
+from pydantic import BaseModel
+from mcp.types import CallToolResult, TextContent, Tool
+
+from mcp_servers.multiMCP import MultiMCP
+from mcp_servers.models import (
+    AddInput, MultiplyInput, PowerInput, StringsToIntsInput, ExpSumInput, FibonacciInput,
+    SearchInput, SearchDocumentsInput, UrlInput,
+)
+from agent.agentSession import PerceptionSnapshot
+from agent.tracing import span
+
+PERCEPTION_FIELDS = {
+    "entities": [],
+    "result_requirement": "No requirement specified.",
+    "original_goal_achieved": False,
+    "reasoning": "No reasoning given.",
+    "local_goal_achieved": False,
+    "local_reasoning": "No local reasoning given.",
+    "last_tooluse_summary": "None",
+    "solution_summary": "No summary.",
+    "confidence": "0.0",
+}
+assert set(PERCEPTION_FIELDS) == set(PerceptionSnapshot.__dataclass_fields__)
+
+# Script answering LLM calls made by the current session (set per AgentLoop.run task)
+current_script: contextvars.ContextVar["ReplayScript"] = contextvars.ContextVar("current_script")
+
+
+# ───────────────────────────────────────────────────────────────
+# SCRIPTED LLM
+# ───────────────────────────────────────────────────────────────
+def _literal(value: Any) -> Any:
+    """Older session logs stringify nested values (repr of dicts, '0' for ints)."""
+    if isinstance(value, str):
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return value
+    return value
+
+
+def perception(**values) -> dict:
+    return {**PERCEPTION_FIELDS, **{k: v for k, v in values.items() if k in PERCEPTION_FIELDS}}
+
+
+class ReplayScript:
+    """
+    Perception and decision replies for one session.
+
+    Decisions are looked up by the plan version they produce, so a speculative decision
+    and the regular one it stands in for get the same reply. Step perceptions are looked
+    up by the plan text they were made against, in recorded order. When the recording
+    runs out, the session is concluded.
+    """
+
+    def __init__(self, recorded: dict):
+        self.query = recorded["original_query"]
+        self.initial_perception = perception(**recorded["perception"])
+        self.decisions: list[dict] = []
+        self.step_perceptions: defaultdict[str, list[dict]] = defaultdict(list)
+        self.llm_calls = 0
+
+        for version in recorded["plan_versions"]:
+            plan_text = version["plan_text"]
+            for step in version["steps"]:
+                code = _literal(step.get("code"))
+                self.decisions.append({
+                    "step_index": int(_literal(step["index"])),
+                    "description": step["description"],
+                    "type": step["type"],
+                    "code": code["tool_arguments"]["code"] if isinstance(code, dict) else "",
+                    "conclusion": step.get("conclusion") or "",
+                    "plan_text": plan_text,
+                })
+                step_perception = _literal(step.get("perception"))
+                if isinstance(step_perception, dict):
+                    self.step_perceptions[json.dumps(plan_text)].append(perception(**step_perception))
+
+    def respond(self, payload: dict) -> dict:
+        self.llm_calls += 1
+        if "plan_mode" in payload:
+            version = payload.get("current_plan_version", 0)
+            if version < len(self.decisions):
+                return self.decisions[version]
+            return {
+                "step_index": payload.get("current_step", {}).get("index", 0) + 1,
+                "description": "Conclude with the results gathered so far.",
+                "type": "CONCLUDE",
+                "code": "",
+                "conclusion": "Replay exhausted; concluding.",
+                "plan_text": ["Step 0: Conclude."],
+            }
+
+        if payload.get("snapshot_type") == "user_query":
+            return self.initial_perception
+        queue = self.step_perceptions.get(json.dumps(payload.get("current_plan")))
+        if queue:
+            return queue.pop(0)
+        return perception(
+            original_goal_achieved=True,
+            local_goal_achieved=True,
+            solution_summary="Replay exhausted.",
+            confidence="1.0",
+        )
+
+
+def stub_embedding(text: str, dim: int = 256) -> list[float]:
+    """Deterministic hashed bag-of-words vector; equal word multisets give equal vectors."""
+    vec = [0.0] * dim
+    for word in text.lower().split():
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vec[bucket] += 1.0 if digest[4] & 1 else -1.0
+    return vec
+
+
+class ScriptedLLM:
+    """
+    Gateway provider answering from `current_script`. Installed with
+    `get_gateway().register_provider("gemini", ScriptedLLM(...))`.
+
+    `latency` is the time to first token; streamed replies are split into `chunk_size`
+    pieces arriving `chunk_delay` apart.
+    """
+
+    def __init__(self, latency: float = 0.0, chunk_size: int = 48, chunk_delay: float = 0.0):
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.calls = 0
+
+    def is_retryable(self, exc: Exception) -> bool:
+        return False
+
+    def _reply(self, prompt: str) -> str:
+        self.calls += 1
+        payload = json.loads(prompt.rsplit("```json", 1)[1].split("```")[0])
+        return f"```json\n{json.dumps(current_script.get().respond(payload), indent=2)}\n```"
+
+    async def generate(self, model: str, prompt: str, **options) -> str:
+        await asyncio.sleep(self.latency)
+        return self._reply(prompt)
+
+    async def stream(self, model: str, prompt: str, **options):
+        reply = self._reply(prompt)
+        await asyncio.sleep(self.latency)
+        for i in range(0, len(reply), self.chunk_size):
+            if i and self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            yield reply[i:i + self.chunk_size]
+
+    async def embed(self, model: str, text: str) -> list[float]:
+        return stub_embedding(text)
+
+
+# ───────────────────────────────────────────────────────────────
+# FAKE MCP SERVERS
+# ───────────────────────────────────────────────────────────────
+SEARCH_RESULTS = "\n\n".join(
+    f"{i}. Ather Energy Limited (ATHERENERG) share price - result {i}\n"
+    f"   URL: https://example.com/ather/{i}\n"
+    f"   Summary: Ather Energy Ltd. share price today is Rs. {300 + i}.{i}0 on NSE."
+    for i in range(1, 11)
+)
+
+DOCUMENT_EXTRACTS = [
+    "Capbridge Ventures LLP paid Rs. 42.94 Crore to DLF for an apartment at The Camellias [Source: dlf.md]",
+    "Anmol Singh Jaggi and Puneet Singh Jaggi are / were promoter Directors [Source: dlf.md]",
+    "Gensol Engineering Limited availed term loans from IREDA and PFC [Source: economic.md]",
+]
+
+
+def _fake_tools() -> dict[str, tuple[str, type[BaseModel], str, Callable[[Any], dict]]]:
+    """tool name -> (server id, input model, description, implementation)"""
+    return {
+        "add": ("math", AddInput, "Add two numbers.", lambda i: {"result": i.a + i.b}),
+        "multiply": ("math", MultiplyInput, "Multiply two numbers.", lambda i: {"result": i.a * i.b}),
+        "power": ("math", PowerInput, "Compute a raised to the power of b.", lambda i: {"result": i.a ** i.b}),
+        "strings_to_chars_to_int": (
+            "math", StringsToIntsInput, "Return ASCII values of characters in a string.",
+            lambda i: {"ascii_values": [ord(c) for c in i.string]},
+        ),
+        "int_list_to_exponential_sum": (
+            "math", ExpSumInput, "Sum exponentials of int list.",
+            lambda i: {"result": sum(math.exp(n) for n in i.numbers)},
+        ),
+        "fibonacci_numbers": (
+            "math", FibonacciInput, "Return the first n Fibonacci numbers.",
+            lambda i: {"result": [round(((1 + 5 ** 0.5) / 2) ** k / 5 ** 0.5) for k in range(i.n)]},
+        ),
+        "search_stored_documents_rag": (
+            "documents", SearchDocumentsInput,
+            "Search old stored documents like PDF, DOCX, TXT, etc. to get relevant extracts.",
+            lambda i: {"result": DOCUMENT_EXTRACTS},
+        ),
+        "convert_webpage_url_into_markdown": (
+            "documents", UrlInput, "Return clean webpage content without Ads, and clutter.",
+            lambda i: {"markdown": f"# {i.url}\n\nAther Energy Ltd. share price: Rs. 305.50 (NSE)."},
+        ),
+        "duckduckgo_search_results": (
+            "websearch", SearchInput, "Search DuckDuckGo.",
+            lambda i: {"result": "\n\n".join(SEARCH_RESULTS.split("\n\n")[:i.max_results])},
+        ),
+    }
+
+
+class FakeMultiMCP(MultiMCP):
+    """
+    MultiMCP whose tools run in-process. Every call sleeps `spawn_latency` (the real
+    client starts a stdio server per call) plus `tool_latency`, then returns a
+    CallToolResult shaped like FastMCP's.
+    """
+
+    def __init__(self, spawn_latency: float = 0.0, tool_latency: float = 0.0):
+        super().__init__(server_configs=[])
+        self.spawn_latency = spawn_latency
+        self.tool_latency = tool_latency
+        self.tool_calls = 0
+        self._impls: dict[str, tuple[type[BaseModel], Callable[[Any], dict]]] = {}
+
+    async def initialize(self):
+        for name, (server, model, description, impl) in _fake_tools().items():
+            schema = {
+                "type": "object",
+                "title": f"{name}Arguments",
+                "properties": {"input": {"$ref": f"#/$defs/{model.__name__}"}},
+                "required": ["input"],
+                "$defs": {model.__name__: model.model_json_schema()},
+            }
+            tool = Tool(name=name, description=description, inputSchema=schema)
+            config = {"id": server, "script": f"<in-process {server}>"}
+            self.tool_map[name] = {"config": config, "tool": tool}
+            self.server_tools.setdefault(server, []).append(tool)
+            self._impls[name] = (model, impl)
+
+    async def call_tool(self, tool_name: str, arguments: dict) -> Any:
+        entry = self.tool_map.get(tool_name)
+        if not entry:
+            raise ValueError(f"Tool '{tool_name}' not found on any server.")
+
+        with span("mcp.call_tool", tool=tool_name, server=entry["config"]["id"]) as trace:
+            self.tool_calls += 1
+            await asyncio.sleep(self.spawn_latency)
+            trace.set(spawn_ms=round(self.spawn_latency * 1000, 3))
+            await asyncio.sleep(self.tool_latency)
+            model, impl = self._impls[tool_name]
+            try:
+                output = impl(model(**arguments["input"]))
+            except Exception as e:
+                trace.set(is_error=True)
+                return CallToolResult(content=[TextContent(type="text", text=f"Error executing tool {tool_name}: {e}")], isError=True)
+            trace.set(is_error=False)
+            return CallToolResult(content=[TextContent(type="text", text=json.dumps(output))], isError=False)
@@ -1,44 +1,73 @@
-import os
 import json
 from pathlib import Path
-from dotenv import load_dotenv
-from google import genai
-from google.genai.errors import ServerError
 import re
 from mcp_servers.multiMCP import MultiMCP
+from agent.llm_gateway import LLMGateway, LLMUnavailableError, get_gateway
+from agent.prompt_cache import PromptTemplate, content_hash
+from agent.llm_cache import ResponseCache, get_response_cache
+from agent.tracing import annotate, traced
 import ast
 
-
-load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY")
-client = genai.Client(api_key=api_key)
+# Fields surfaced to the caller as soon as they are complete in a streamed response
+PARTIAL_FIELDS = ("type", "description", "code")
 
 class Decision:
-    def __init__(self, decision_prompt_path: str, multi_mcp: MultiMCP, api_key: str | None = None, model: str = "gemini-2.0-flash",  ):
-        load_dotenv()
+    def __init__(self, decision_prompt_path: str, multi_mcp: MultiMCP, model: str = "gemini-2.0-flash", stream: bool = False, gateway: LLMGateway | None = None, cache: ResponseCache | None = None):
         self.decision_prompt_path = decision_prompt_path
+        self.template = PromptTemplate(decision_prompt_path)
         self.multi_mcp = multi_mcp
+        self._prefix_cache: tuple | None = None
+        self.model = model
+        self.stream = stream
+        self.gateway = gateway or get_gateway()
+        self.cache = cache or get_response_cache()
+
+    def static_prefix(self) -> tuple[str, tuple[str, str]]:
+        """
+        Prompt template plus tool catalog, rebuilt only when either of them changes.
+        Returns the prefix and its (template hash, tool-catalog hash) cache key.
+        """
+        prompt_template = self.template.text
+        key = (self.template.version, self.multi_mcp.tool_catalog_key())
+        if self._prefix_cache and self._prefix_cache[0] == key:
+            return self._prefix_cache[1], self._prefix_cache[2]
 
-        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment or explicitly provided.")
-        self.client = genai.Client(api_key=self.api_key)
-        
-
-    def run(self, decision_input: dict) -> dict:
-        prompt_template = Path(self.decision_prompt_path).read_text(encoding="utf-8")
         function_list_text = self.multi_mcp.tool_description_wrapper()
         tool_descriptions = "\n".join(f"- `{desc.strip()}`" for desc in function_list_text)
         tool_descriptions = "\n\n### The ONLY Available Tools\n\n---\n\n" + tool_descriptions
-        full_prompt = f"{prompt_template.strip()}\n{tool_descriptions}\n\n```json\n{json.dumps(decision_input, indent=2)}\n```"
+        prefix = f"{prompt_template}\n{tool_descriptions}\n\n"
+        prefix_key = (self.template.digest, content_hash(tool_descriptions))
+        self._prefix_cache = (key, prefix, prefix_key)
+        return prefix, prefix_key
+
+    @traced("decision.run")
+    async def run(self, decision_input: dict, on_partial=None) -> dict:
+        prefix, prefix_key = self.static_prefix()
+        payload = f"```json\n{json.dumps(decision_input, indent=2)}\n```"
+
+        # Only initial plans are cached: a mid-session decision (e.g. a replan after a failed
+        # step) must come from the model, or it could replay the plan that just failed
+        cacheable = self.cache is not None and decision_input.get("plan_mode") == "initial"
+        similarity_text = decision_input.get("original_query") if cacheable else None
+        annotate(plan_mode=decision_input.get("plan_mode"))
+        if cacheable:
+            cached = await self.cache.get("decision", prefix_key, decision_input, similarity_text)
+            annotate(cache_hit=cached is not None)
+            if cached is not None:
+                return cached
 
         try:
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=full_prompt
+            raw_text = await self.gateway.generate(
+                payload,
+                prefix=prefix,
+                prefix_key=prefix_key,
+                model=self.model,
+                stream=self.stream,
+                watch_fields=PARTIAL_FIELDS,
+                on_partial=on_partial
             )
-        except ServerError as e:
-            print(f"🚫 Decision LLM ServerError: {e}")
+        except LLMUnavailableError as e:
+            print(f"🚫 Decision LLM unavailable: {e}")
             return {
                 "step_index": 0,
                 "description": "Decision model unavailable: server overload.",
@@ -49,24 +78,22 @@ class Decision:
                 "raw_text": str(e)
             }
 
-        raw_text = response.candidates[0].content.parts[0].text.strip()
-
         try:
             match = re.search(r"```json\s*(\{.*?\})\s*```", raw_text, re.DOTALL)
             if not match:
                 raise ValueError("No JSON block found")
 
             json_block = match.group(1)
+            salvaged = False
             try:
                 output = json.loads(json_block)
             except json.JSONDecodeError as e:
+                salvaged = True
                 print("⚠️ JSON decode failed, attempting salvage via regex...")
 
                 # Attempt to extract a 'code' block manually
                 code_match = re.search(r'code\s*:\s*"(.*?)"', json_block, re.DOTALL)
                 code_value = bytes(code_match.group(1), "utf-8").decode("unicode_escape") if code_match else ""
-                import pdb; pdb.set_trace()
-
 
                 output = {
                     "step_index": 0,
@@ -90,13 +117,16 @@ class Decision:
                 "conclusion": "",
                 "plan_text": ["Step 0: No valid plan returned by LLM."]
             }
+            defaulted = [key for key in defaults if key not in output]
             for key, default in defaults.items():
                 output.setdefault(key, default)
 
+            # Salvaged or default-filled outputs are one-off repairs, not answers worth replaying
+            if cacheable and not salvaged and not defaulted:
+                await self.cache.put("decision", prefix_key, decision_input, output, similarity_text)
             return output
 
         except Exception as e:
-            import pdb; pdb.set_trace()
             print("❌ Unrecoverable exception while parsing LLM response:", str(e))
             return {
                 "step_index": 0,
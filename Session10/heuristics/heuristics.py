@@ -1,19 +1,133 @@
 import re
 import os
+import time
+import asyncio
+import inspect
 from urllib.parse import urlparse
-import requests
-from typing import List, Tuple, Callable
+import httpx
+from typing import Awaitable, Dict, List, Optional, Tuple, Callable, Union
+
+# Patterns are compiled once per process instead of on every check
+URL_PATTERNS = [
+    # Full URLs with protocol
+    re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'),
+    # Domain-like patterns (e.g., www.example.com or example.com)
+    re.compile(r'(?:www\.)?[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+(?:/[^\s]*)?')
+]
+PATH_PATTERN = re.compile(r'(?:\/[\w.-]+)+|(?:[A-Za-z]:\\(?:[^\\/:*?"<>|\r\n]+\\)*[^\\/:*?"<>|\r\n]*)')
+SENTENCE_SPLIT = re.compile(r'[.!?]+')
+
+URL_TIMEOUT = 5.0           # per URL, as before
+RULES_DEADLINE = 6.0        # for the whole validate() pass
+REACHABLE_TTL = 300.0       # seconds a reachability result is reused
+UNREACHABLE_TTL = 60.0
+
+BLACKLIST = {
+    'spam', 'hack', 'crack', 'illegal', 'exploit',
+    'password', 'credit card', 'ssn', 'private'
+}
+
+RuleResult = Tuple[bool, str]
+Rule = Callable[[str], Union[RuleResult, Awaitable[RuleResult]]]
+
+
+class BlacklistMatcher:
+    """
+    All blacklisted words as one trie-shaped regex, rebuilt only when the word list changes,
+    so checking and masking are a single pass over the text. Matching is case-insensitive:
+    the regex scans text.lower() (IGNORECASE is several times slower in `re`) and falls back
+    to an IGNORECASE copy when lowercasing would shift offsets. The longest word matching at
+    a position wins; spaces inside a phrase match any whitespace run.
+    With `whole_words`, a word only matches between non-word characters ("hack" not in "hacker").
+    """
+
+    def __init__(self, words=(), whole_words: bool = False):
+        self.whole_words = whole_words
+        self.words: set = set()
+        self._pattern: Optional[re.Pattern] = None
+        self._pattern_ignorecase: Optional[re.Pattern] = None
+        self.add(words)
+
+    def add(self, words):
+        new = {" ".join(word.lower().split()) for word in words} - {""}
+        if not new <= self.words:
+            self.words |= new
+            self._pattern = self._pattern_ignorecase = None
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __len__(self):
+        return len(self.words)
+
+    @staticmethod
+    def _trie_regex(node: dict) -> str:
+        """Regex for a character trie: shared prefixes are matched once, longest match wins"""
+        branches = [
+            (r"\s+" if char == " " else re.escape(char)) + BlacklistMatcher._trie_regex(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:  # a word ends here; try the longer words first
+            body = body + "?" if len(branches) == 1 and len(branches[0]) == 1 else f"(?:{body})?"
+        return body
+
+    @property
+    def pattern(self) -> Optional[re.Pattern]:
+        """Case-sensitive pattern over the lowercased words; None for an empty blacklist"""
+        if self._pattern is None and self.words:
+            # One alternation branch per word makes re try every word at every position;
+            # a trie branches on one character at a time instead
+            trie: dict = {}
+            for word in self.words:
+                node = trie
+                for char in word:
+                    node = node.setdefault(char, {})
+                node[""] = {}
+            alternation = self._trie_regex(trie)
+            if self.whole_words:
+                alternation = rf"(?<!\w)(?:{alternation})(?!\w)"
+            self._pattern = re.compile(alternation)
+        return self._pattern
+
+    def spans(self, text: str) -> List[Tuple[int, int]]:
+        """(start, end) of every non-overlapping match in `text`, left to right"""
+        if self.pattern is None:
+            return []
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            return [match.span() for match in self.pattern.finditer(lowered)]
+        # e.g. "İ".lower() is two characters: offsets would no longer line up with `text`
+        if self._pattern_ignorecase is None:
+            self._pattern_ignorecase = re.compile(self.pattern.pattern, re.IGNORECASE)
+        return [match.span() for match in self._pattern_ignorecase.finditer(text)]
+
+    def found(self, text: str) -> List[str]:
+        """Distinct blacklisted words in the text, in order of first appearance"""
+        return list(dict.fromkeys(" ".join(text[start:end].lower().split()) for start, end in self.spans(text)))
+
+    def mask(self, text: str, char: str = "X") -> str:
+        """Replace every match with `char`, keeping the text length and everything around it"""
+        parts, last = [], 0
+        for start, end in self.spans(text):
+            parts += [text[last:start], char * (end - start)]
+            last = end
+        return "".join(parts) + text[last:] if parts else text
+
 
 class QueryHeuristics:
-    def __init__(self):
-        # Blacklisted words - can be expanded
-        self.blacklist = {
-            'spam', 'hack', 'crack', 'illegal', 'exploit',
-            'password', 'credit card', 'ssn', 'private'
-        }
+    # Shared by every instance: one HTTP client and one reachability cache per process
+    _client: Optional[httpx.AsyncClient] = None
+    _reachability: Dict[str, Tuple[bool, str, float]] = {}
+
+    def __init__(self, whole_word_blacklist: bool = False):
+        # Blacklisted words - can be expanded with add_blacklist_words()
+        self.blacklist = BlacklistMatcher(BLACKLIST, whole_words=whole_word_blacklist)
         
         # Register heuristic rules - easy to add more
-        self.rules: List[Tuple[str, Callable[[str], Tuple[bool, str]]]] = [
+        self.rules: List[Tuple[str, Rule]] = [
             ("URL Validation", self._check_url),
             ("File Path Validation", self._check_file_path),
             ("Sentence Length", self._check_sentence_length),
@@ -27,16 +141,9 @@ class QueryHeuristics:
         Returns list of (original_url, processed_url) tuples
         """
         # Match both full URLs and domain-like patterns
-        url_patterns = [
-            # Full URLs with protocol
-            r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+',
-            # Domain-like patterns (e.g., www.example.com or example.com)
-            r'(?:www\.)?[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+(?:/[^\s]*)?'
-        ]
-        
         found_urls = []
-        for pattern in url_patterns:
-            matches = re.finditer(pattern, text)
+        for pattern in URL_PATTERNS:
+            matches = pattern.finditer(text)
             for match in matches:
                 url = match.group()
                 # Skip if already has protocol
@@ -49,34 +156,62 @@ class QueryHeuristics:
         
         return found_urls
 
-    def _check_url(self, query: str) -> Tuple[bool, str]:
+    @classmethod
+    def _http_client(cls) -> httpx.AsyncClient:
+        if cls._client is None or cls._client.is_closed:
+            cls._client = httpx.AsyncClient(timeout=URL_TIMEOUT)
+        return cls._client
+
+    @classmethod
+    async def aclose(cls):
+        if cls._client is not None:
+            await cls._client.aclose()
+            cls._client = None
+
+    async def _probe_url(self, url: str) -> Tuple[bool, str]:
+        """HEAD one URL; results are cached for REACHABLE_TTL / UNREACHABLE_TTL seconds"""
+        cached = self._reachability.get(url)
+        if cached and cached[2] > time.monotonic():
+            return cached[0], cached[1]
+
+        try:
+            response = await self._http_client().head(url)
+            if response.status_code >= 400:
+                ok, message = False, f"URL {url} is not accessible"
+            else:
+                ok, message = True, ""
+        except httpx.HTTPError:
+            ok, message = False, f"Failed to connect to {url}"
+
+        self._reachability[url] = (ok, message, time.monotonic() + (REACHABLE_TTL if ok else UNREACHABLE_TTL))
+        return ok, message
+
+    async def _check_url(self, query: str) -> Tuple[bool, str]:
         """Enhanced URL validation for natural language queries"""
         urls = self._extract_urls_from_text(query)
         
         if not urls:
             return True, "No URLs found in query"
-            
-        for _, processed_url in urls:
-            try:
-                response = requests.head(processed_url, timeout=5)
-                if response.status_code >= 400:
-                    return False, f"URL {processed_url} is not accessible"
-            except requests.RequestException:
-                return False, f"Failed to connect to {processed_url}"
+
+        # All URLs are probed concurrently; the first failure in query order is reported
+        unique = list(dict.fromkeys(processed_url for _, processed_url in urls))
+        for ok, message in await asyncio.gather(*(self._probe_url(url) for url in unique)):
+            if not ok:
+                return False, message
         
         return True, "All URLs in query are valid and accessible"
 
-    def _check_file_path(self, query: str) -> Tuple[bool, str]:
+    async def _check_file_path(self, query: str) -> Tuple[bool, str]:
         """Check if file paths in the query are valid"""
         # Match common file path patterns
-        path_pattern = r'(?:\/[\w.-]+)+|(?:[A-Za-z]:\\(?:[^\\/:*?"<>|\r\n]+\\)*[^\\/:*?"<>|\r\n]*)'
-        paths = re.findall(path_pattern, query)
+        paths = PATH_PATTERN.findall(query)
         
         if not paths:
             return True, "No file paths found"
-            
-        for path in paths:
-            if not os.path.exists(path):
+
+        exists = await asyncio.to_thread(lambda: [os.path.exists(path) for path in paths])
+        for path, found in zip(paths, exists):
+            if not found:
                 return False, f"File path does not exist: {path}"
         
         return True, "All file paths are valid"
@@ -84,7 +219,7 @@ class QueryHeuristics:
     def _check_sentence_length(self, query: str) -> Tuple[bool, str]:
         """Check if sentences are within length limit"""
         # Split by common sentence terminators and remove empty strings
-        sentences = [s.strip() for s in re.split(r'[.!?]+', query) if s.strip()]
+        sentences = [s.strip() for s in SENTENCE_SPLIT.split(query) if s.strip()]
         max_length = 100
         
         for sentence in sentences:
@@ -102,8 +237,7 @@ class QueryHeuristics:
 
     def _check_blacklist(self, query: str) -> Tuple[bool, str]:
         """Check for blacklisted words"""
-        query_lower = query.lower()
-        found_words = [word for word in self.blacklist if word in query_lower]
+        found_words = self.blacklist.found(query)
         
         if found_words:
             return False, f"Found blacklisted words: {', '.join(found_words)}"
@@ -130,14 +264,8 @@ class QueryHeuristics:
         return True, "All URLs have proper protocols"
 
     def _sanitize_blacklisted_words(self, text: str) -> str:
-        """Replace blacklisted words with XXXX"""
-        sanitized = text.lower()
-        for word in self.blacklist:
-            if word in sanitized:
-                # Replace with XXXX of same length as the word
-                text = text.replace(word, 'X' * len(word))
-                text = text.replace(word.upper(), 'X' * len(word))
-        return text
+        """Replace blacklisted words (any case) with X's of the same length"""
+        return self.blacklist.mask(text)
 
     def process(self, query: str) -> Tuple[bool, str, str]:
         """
@@ -152,10 +280,37 @@ class QueryHeuristics:
         
         return True, "", query
 
-    def add_rule(self, name: str, rule_func: Callable[[str], Tuple[bool, str]]):
-        """Add a new heuristic rule"""
+    async def _run_rule(self, rule: Rule, query: str) -> Tuple[bool, str]:
+        if inspect.iscoroutinefunction(rule):
+            return await rule(query)
+        return rule(query)
+
+    async def validate(self, query: str, deadline: float = RULES_DEADLINE) -> List[Tuple[str, bool, str]]:
+        """
+        Run every rule concurrently under one overall deadline.
+        Returns (rule name, passed, message) in rule order; a rule still running at the
+        deadline is cancelled and reported as failed.
+        """
+        tasks = [asyncio.create_task(self._run_rule(rule, query)) for _, rule in self.rules]
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+
+        results = []
+        for (name, _), task in zip(self.rules, tasks):
+            if task in pending:
+                results.append((name, False, f"Check did not finish within {deadline}s"))
+            elif task.exception() is not None:
+                results.append((name, False, f"Check failed: {task.exception()}"))
+            else:
+                passed, message = task.result()
+                results.append((name, passed, message))
+        return results
+
+    def add_rule(self, name: str, rule_func: Rule):
+        """Add a new heuristic rule (a plain or async function)"""
         self.rules.append((name, rule_func))
 
     def add_blacklist_words(self, words: List[str]):
         """Add new words to blacklist"""
-        self.blacklist.update(words)
+        self.blacklist.add(words)
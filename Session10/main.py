@@ -5,6 +5,7 @@ from mcp_servers.multiMCP import MultiMCP
 from dotenv import load_dotenv
 # from agent.agent_loop import AgentLoop
 from agent.agent_loop2 import AgentLoop
+from agent.llm_gateway import get_gateway
 from pprint import pprint
 BANNER = """
 ──────────────────────────────────────────────────────
@@ -30,7 +31,9 @@ async def interactive() -> None:
         perception_prompt_path="prompts/perception_prompt.txt",
         decision_prompt_path="prompts/decision_prompt.txt",
         multi_mcp=multi_mcp,
-        strategy="exploratory"
+        strategy="exploratory",
+        stream=True,
+        speculative=True
     )
     while True:
 
@@ -50,5 +53,7 @@ async def interactive() -> None:
             print("👋  Goodbye!")
             break
 
+    await get_gateway().aclose()
+
 if __name__ == "__main__":
     asyncio.run(interactive())
@@ -0,0 +1,244 @@
+"""
+Per-session blob store for large tool results.
+
+Tool results used to be serialized to text several times on their way from a server to
+the prompts (JSON-RPC, json.loads, str() for perception). Large ones now go to a file
+once, and only a small handle travels instead:
+
+    {"blob": "<sha256>", "media_type": "text/markdown", "size": 48213, "preview": "# Title ..."}
+
+- Servers call `offload()`. Text under INLINE_LIMIT bytes stays inline; bytes never do,
+  since they cannot go through JSON as-is.
+- MCP servers are short-lived local processes, so blobs are plain files under the system
+  temp directory (tmpfs on most Linux hosts). MultiMCP passes the current session's
+  directory to every server it spawns through AGENT_BLOB_DIR.
+- On the agent side `hydrate()` turns handles into `BlobRef`s, whose str() is the bounded
+  preview. Sandbox code never sees a BlobRef: the executor's tool proxies `resolve()` them
+  to the real content (str, bytes or parsed JSON), remembering which objects came from
+  blobs, and `preview()` swaps those objects back for their BlobRef when the step result
+  is serialized for perception. A later step loads a blob again with `read_blob()`.
+- Blobs are content-addressed, so a repeated result is stored once per session. Session
+  directories older than SESSION_TTL are removed when the first session store is opened.
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional, Union
+
+BLOB_DIR_ENV = "AGENT_BLOB_DIR"
+BLOB_ROOT = Path(tempfile.gettempdir()) / "agent_blobs"
+DEFAULT_SESSION = "default"
+INLINE_LIMIT = 8 * 1024   # bytes; smaller text results are returned inline
+PREVIEW_CHARS = 2000
+SESSION_TTL = 24 * 3600
+SHORT_ID = 16             # hex digits shown in previews; read_blob accepts any unique prefix
+
+_session: contextvars.ContextVar[str] = contextvars.ContextVar("blob_session", default=DEFAULT_SESSION)
+
+
+class BlobStore:
+    """Content-addressed files in one directory."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, blob_id: str) -> Path:
+        if len(blob_id) < 8 or not all(c in "0123456789abcdef" for c in blob_id):
+            raise ValueError(f"Invalid blob id: {blob_id!r}")
+        exact = self.root / blob_id
+        if exact.exists():
+            return exact
+        matches = list(self.root.glob(blob_id + "*"))
+        if len(matches) != 1:
+            raise KeyError(f"Blob {blob_id} not found" if not matches else f"Blob id {blob_id} is ambiguous")
+        return matches[0]
+
+    def put(self, data: bytes) -> str:
+        blob_id = hashlib.sha256(data).hexdigest()
+        target = self.root / blob_id
+        if not target.exists():
+            fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)  # readers never see a partial blob
+        return blob_id
+
+    def get(self, blob_id: str) -> bytes:
+        return self.path(blob_id).read_bytes()
+
+
+# ───────────────────────────────────────────────────────────────
+# SESSIONS
+# ───────────────────────────────────────────────────────────────
+_stores: dict[str, BlobStore] = {}
+
+
+def sweep(max_age: float = SESSION_TTL, root: Path = BLOB_ROOT):
+    """Remove session directories untouched for `max_age` seconds."""
+    if not root.exists():
+        return
+    cutoff = time.time() - max_age
+    for session_dir in root.iterdir():
+        if session_dir.is_dir() and session_dir.stat().st_mtime < cutoff:
+            shutil.rmtree(session_dir, ignore_errors=True)
+
+
+@contextmanager
+def use_session(session_id: Optional[str]) -> Iterator[None]:
+    """Route blobs of tool calls made inside the block to this session's directory."""
+    if not session_id:
+        yield
+        return
+    token = _session.set(session_id)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+
+def session_store() -> BlobStore:
+    """Agent side: the store of the current session."""
+    session_id = _session.get()
+    if session_id not in _stores:
+        if not _stores:
+            sweep()
+        _stores[session_id] = BlobStore(BLOB_ROOT / session_id)
+    return _stores[session_id]
+
+
+def server_store() -> BlobStore:
+    """Server side: the directory MultiMCP passed in, or the default session's."""
+    root = os.environ.get(BLOB_DIR_ENV)
+    return BlobStore(Path(root)) if root else BlobStore(BLOB_ROOT / DEFAULT_SESSION)
+
+
+# ───────────────────────────────────────────────────────────────
+# HANDLES
+# ───────────────────────────────────────────────────────────────
+def is_handle(value: Any) -> bool:
+    return isinstance(value, dict) and "blob" in value and "media_type" in value
+
+
+def is_text(media_type: str) -> bool:
+    return media_type.startswith("text/") or media_type == "application/json"
+
+
+def offload(
+    data: Union[str, bytes],
+    media_type: str = "text/plain",
+    preview: Optional[str] = None,
+    store: Optional[BlobStore] = None,
+) -> Union[str, dict]:
+    """Server side: `data` itself if it is small text, else a handle to it in the blob store."""
+    raw = data.encode("utf-8") if isinstance(data, str) else data
+    if isinstance(data, str) and len(raw) <= INLINE_LIMIT:
+        return data
+    blob_id = (store or server_store()).put(raw)
+    if preview is None:
+        preview = data[:PREVIEW_CHARS] if isinstance(data, str) else ""
+    return {"blob": blob_id, "media_type": media_type, "size": len(raw), "preview": preview}
+
+
+class BlobRef:
+    """Agent-side view of a handle: prints as its preview, and loads the content on demand."""
+    __slots__ = ("id", "media_type", "size", "preview", "store", "_value")
+
+    def __init__(self, handle: dict, store: BlobStore):
+        self.id = handle["blob"]
+        self.media_type = handle["media_type"]
+        self.size = handle.get("size", 0)
+        self.preview = handle.get("preview", "")
+        self.store = store
+        self._value = None
+
+    def handle(self) -> dict:
+        return {"blob": self.id, "media_type": self.media_type, "size": self.size, "preview": self.preview}
+
+    def data(self) -> bytes:
+        return self.store.get(self.id)
+
+    def value(self) -> Union[str, bytes, Any]:
+        """The full content: parsed JSON, text, or bytes depending on media_type."""
+        if self._value is None:
+            data = self.data()
+            if self.media_type == "application/json":
+                self._value = json.loads(data)
+            elif is_text(self.media_type):
+                self._value = data.decode("utf-8")
+            else:
+                self._value = data
+        return self._value
+
+    def __str__(self):
+        head = f'[blob {self.id[:SHORT_ID]}: {self.media_type}, {self.size} bytes; read_blob("{self.id[:SHORT_ID]}") returns the full content]'
+        if not self.preview:
+            return head
+        more = " ..." if is_text(self.media_type) and len(self.preview) < self.size else ""
+        return f"{head}\n{self.preview}{more}"
+
+    __repr__ = __str__
+
+
+def hydrate(value: Any, store: Optional[BlobStore] = None) -> Any:
+    """Agent side: replace handles anywhere in a parsed tool result with BlobRefs."""
+    if is_handle(value):
+        return BlobRef(value, store or session_store())
+    if isinstance(value, dict):
+        return {k: hydrate(v, store) for k, v in value.items()}
+    if isinstance(value, list):
+        return [hydrate(v, store) for v in value]
+    return value
+
+
+def resolve(value: Any, refs: Optional[dict] = None) -> Any:
+    """
+    Agent side: BlobRefs anywhere in `value` become their content. With `refs`, each content
+    object is recorded as id(content) -> (content, ref), so preview() can find it again.
+    """
+    if isinstance(value, BlobRef):
+        content = value.value()
+        if refs is not None:
+            refs[id(content)] = (content, value)
+        return content
+    if isinstance(value, dict):
+        return {k: resolve(v, refs) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(resolve(v, refs) for v in value)
+    return value
+
+
+def preview(value: Any, refs: dict) -> Any:
+    """Inverse of resolve(value, refs) for display: blob contents are swapped back for their BlobRef."""
+    entry = refs.get(id(value))
+    if entry is not None and entry[0] is value:
+        return entry[1]
+    if isinstance(value, dict):
+        return {k: preview(v, refs) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(preview(v, refs) for v in value)
+    return value
+
+
+def read_blob(ref: Union[BlobRef, dict, str], start: int = 0, length: Optional[int] = None) -> Union[str, bytes, Any]:
+    """
+    Sandbox helper: the content behind a BlobRef, a handle, or a blob id printed in an
+    earlier step's result. `start`/`length` slice text or bytes, to read a large blob in parts.
+    """
+    if isinstance(ref, str):
+        data = session_store().get(ref)
+        try:
+            content = data.decode("utf-8")
+        except UnicodeDecodeError:
+            content = data
+    else:
+        content = (ref if isinstance(ref, BlobRef) else BlobRef(ref, session_store())).value()
+    if isinstance(content, (str, bytes)) and (start or length is not None):
+        return content[start:None if length is None else start + length]
+    return content
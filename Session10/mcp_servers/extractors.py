@@ -0,0 +1,263 @@
+"""
+Document extraction for mcp_server_2.
+
+- PDFs are converted page by page with pymupdf4llm; large page sets are split into
+  contiguous page ranges and extracted across a shared process pool.
+- Office and other formats go through one reused MarkItDown converter.
+- Every extracted page is stored in a SQLite cache keyed by (file hash, page number,
+  extractor version), so re-running extraction on an unchanged or partially changed
+  file only converts the pages that are missing.
+"""
+import os
+import re
+import sys
+import math
+import sqlite3
+import hashlib
+import threading
+import multiprocessing
+import importlib.metadata
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+import pymupdf
+import pymupdf4llm
+from pymupdf4llm.helpers.pymupdf_rag import IdentifyHeaders
+from markitdown import MarkItDown
+
+ROOT = Path(__file__).parent.resolve()
+CACHE_DB = ROOT / "faiss_index" / "page_cache.sqlite"
+
+PDF_EXTRACTOR_VERSION = f"pymupdf4llm-{importlib.metadata.version('pymupdf4llm')}"
+MARKITDOWN_VERSION = f"markitdown-{importlib.metadata.version('markitdown')}"
+WHOLE_DOCUMENT = 0          # page number used for formats without pages
+MIN_PAGES_FOR_POOL = 8      # below this, extracting in-process beats shipping work to the pool
+FIRST_BATCH_PAGES = 2
+MAX_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+IMAGE_LINK = re.compile(r'!\[[^\]]*\]\(([^)]+)\)')
+
+
+# ───────────────────────────────────────────────────────────────
+# PAGE CACHE
+# ───────────────────────────────────────────────────────────────
+class PageCache:
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            """CREATE TABLE IF NOT EXISTS pages (
+                file_hash TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                extractor TEXT NOT NULL,
+                markdown TEXT NOT NULL,
+                PRIMARY KEY (file_hash, page, extractor)
+            )"""
+        )
+        self.db.commit()
+
+    def get_many(self, file_hash: str, pages: Iterable[int], extractor: str) -> dict[int, str]:
+        wanted = set(pages)
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT page, markdown FROM pages WHERE file_hash = ? AND extractor = ?",
+                (file_hash, extractor)
+            ).fetchall()
+        return {page: markdown for page, markdown in rows if page in wanted}
+
+    def put_many(self, file_hash: str, extractor: str, pages: dict[int, str]):
+        with self._lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO pages (file_hash, page, extractor, markdown) VALUES (?, ?, ?, ?)",
+                [(file_hash, page, extractor, markdown) for page, markdown in pages.items()]
+            )
+            self.db.commit()
+
+
+_cache: Optional[PageCache] = None
+_hashes: dict[tuple, str] = {}
+
+
+def page_cache() -> PageCache:
+    global _cache
+    if _cache is None:
+        _cache = PageCache(CACHE_DB)
+    return _cache
+
+
+def file_hash(path: str | Path) -> str:
+    """sha256 of the file contents, memoized per (path, size, mtime)."""
+    stat = os.stat(path)
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        _hashes[key] = digest.hexdigest()
+    return _hashes[key]
+
+
+# ───────────────────────────────────────────────────────────────
+# PDF
+# ───────────────────────────────────────────────────────────────
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn everywhere: forking would copy the MCP server's stdio threads into the workers
+        _pool = ProcessPoolExecutor(
+            max_workers=MAX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    return _pool
+
+
+def _init_worker():
+    """
+    Workers inherit the MCP server's stdout, which carries the JSON-RPC stream: send
+    anything they print (Python or C level, e.g. pymupdf warnings) to stderr instead.
+    """
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+def _extract_pdf_batch(path: str, pages: list[int], image_dir: str, headers: IdentifyHeaders) -> dict[int, str]:
+    """
+    Markdown for 1-based `pages` of a PDF. Runs in pool workers, so it must stay top-level.
+    `headers` is computed over the whole document so heading levels do not depend on the batch.
+    """
+    chunks = pymupdf4llm.to_markdown(
+        path,
+        pages=[p - 1 for p in pages],
+        hdr_info=headers,
+        page_chunks=True,
+        write_images=True,
+        image_path=image_dir,
+        show_progress=False,
+    )
+    return {page: chunk["text"] for page, chunk in zip(pages, chunks)}
+
+
+def _discard_images(pages: dict[int, str]):
+    """Delete the images written for extracted pages that will never be yielded."""
+    for markdown in pages.values():
+        for src in IMAGE_LINK.findall(markdown):
+            Path(src).unlink(missing_ok=True)
+
+
+def _discard_batch(future):
+    if not future.cancelled() and future.exception() is None:
+        _discard_images(future.result())
+
+
+def pdf_page_count(path: str | Path) -> int:
+    with pymupdf.open(path) as doc:
+        return doc.page_count
+
+
+def _batches(pages: list[int]) -> list[list[int]]:
+    """
+    Split pages into contiguous ranges, about two per worker so slow pages even out.
+    The first range is kept short so the first pages are ready quickly for streaming readers.
+    """
+    size = max(2, math.ceil(len(pages) / (MAX_WORKERS * 2)))
+    head = pages[:FIRST_BATCH_PAGES]
+    return [head] + [pages[i:i + size] for i in range(len(head), len(pages), size)]
+
+
+def iter_pdf_pages(
+    path: str | Path,
+    pages: Optional[Iterable[int]] = None,
+    *,
+    image_dir: str | Path,
+    postprocess: Optional[Callable[[str], tuple[str, bool]]] = None,
+    version: str = PDF_EXTRACTOR_VERSION,
+) -> Iterator[tuple[int, str]]:
+    """
+    Yield (page number, markdown) in page order for the 1-based `pages` (default: all).
+
+    Cached pages are yielded immediately; the rest are extracted in page-range batches,
+    in-process for a few pages and across the process pool otherwise. `postprocess` runs on
+    each freshly extracted page as it is yielded and before it is cached, so `version` must
+    identify it too. It returns (markdown, complete); an incomplete page (e.g. a caption
+    failed) is yielded but not cached, so the next call extracts it again. Pages the consumer
+    never asks for are not postprocessed, and the images written for them are deleted.
+    """
+    path = str(path)
+    total = pdf_page_count(path)
+    wanted = sorted({p for p in (range(1, total + 1) if pages is None else pages) if 1 <= p <= total})
+    fhash = file_hash(path)
+    cached = page_cache().get_many(fhash, wanted, version)
+    missing = [p for p in wanted if p not in cached]
+
+    batches = _batches(missing) if len(missing) >= MIN_PAGES_FOR_POOL else ([missing] if missing else [])
+    use_pool = len(batches) > 1
+    headers = IdentifyHeaders(path) if missing else None
+    futures = {b[0]: _get_pool().submit(_extract_pdf_batch, path, b, str(image_dir), headers) for b in batches} if use_pool else {}
+    inline = {} if use_pool else {b[0]: b for b in batches}
+
+    fresh: dict[int, str] = {}
+    try:
+        for page in wanted:
+            if page in cached:
+                yield page, cached[page]
+                continue
+            if page not in fresh:
+                if use_pool:
+                    fresh.update(futures.pop(page).result())
+                else:
+                    fresh.update(_extract_pdf_batch(path, inline.pop(page), str(image_dir), headers))
+            markdown, complete = fresh.pop(page), True
+            if postprocess:
+                markdown, complete = postprocess(markdown)
+            if complete:
+                page_cache().put_many(fhash, version, {page: markdown})
+            yield page, markdown
+    finally:
+        # Consumer stopped early: cancel the remaining batches and delete their images
+        for future in futures.values():
+            if not future.cancel():
+                future.add_done_callback(_discard_batch)  # already running; runs now if done
+        _discard_images(fresh)
+
+
+def extract_pdf_pages(path: str | Path, pages: Optional[Iterable[int]] = None, **kwargs) -> dict[int, str]:
+    return dict(iter_pdf_pages(path, pages, **kwargs))
+
+
+# ───────────────────────────────────────────────────────────────
+# OFFICE / OTHER FORMATS
+# ───────────────────────────────────────────────────────────────
+_markitdown: Optional[MarkItDown] = None
+_markitdown_lock = threading.Lock()
+
+
+def get_markitdown() -> MarkItDown:
+    global _markitdown
+    with _markitdown_lock:
+        if _markitdown is None:
+            _markitdown = MarkItDown()
+        return _markitdown
+
+
+def convert_document(path: str | Path) -> str:
+    """Markdown for a DOCX/PPTX/XLSX/... file through the shared converter, cached per file hash."""
+    fhash = file_hash(path)
+    cached = page_cache().get_many(fhash, [WHOLE_DOCUMENT], MARKITDOWN_VERSION)
+    if WHOLE_DOCUMENT in cached:
+        return cached[WHOLE_DOCUMENT]
+    text = get_markitdown().convert(str(path)).text_content
+    page_cache().put_many(fhash, MARKITDOWN_VERSION, {WHOLE_DOCUMENT: text})
+    return text
@@ -0,0 +1,145 @@
+"""
+Visible text of an HTML page for the web tools, with a character budget.
+
+Engines, fastest first; the first one installed is used:
+
+- lxml: libxml2 SAX-style target parser fed in chunks, so parsing itself stops
+  once the budget is filled
+- selectolax (lexbor): C parser over the whole page, text nodes walked in document order
+- bs4: the original BeautifulSoup("html.parser") path, always available
+
+All engines drop script/style/nav/header/footer and HTML comments, collapse whitespace
+runs to single spaces, and cut the text at `limit` characters. Extraction is CPU-bound,
+so async callers should run it in a thread (see `extract_text_async`).
+"""
+import asyncio
+import importlib.util
+from typing import Callable, Optional
+
+SKIP_TAGS = frozenset({"script", "style", "nav", "header", "footer"})
+DEFAULT_LIMIT = 8000
+TRUNCATED = "... [content truncated]"
+FEED_CHUNK = 64 * 1024
+
+
+class TextBudget:
+    """
+    Accumulates text fragments as " ".join(full_text.split()) would produce them,
+    and reports when more than `limit` characters have been collected.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.parts: list[str] = []
+        self.length = 0
+        self._space = False  # whitespace seen since the last word
+
+    def add(self, fragment: str) -> bool:
+        """Append a fragment; True once the budget is exceeded."""
+        words = fragment.split()
+        if not words:
+            self._space = self._space or bool(fragment)
+            return False
+        if self.parts and (self._space or fragment[0].isspace()):
+            self.parts.append(" ")
+            self.length += 1
+        piece = " ".join(words)
+        self.parts.append(piece)
+        self.length += len(piece)
+        self._space = fragment[-1].isspace()
+        return self.length > self.limit
+
+    def text(self) -> str:
+        text = "".join(self.parts)
+        if len(text) > self.limit:
+            text = text[:self.limit] + TRUNCATED
+        return text
+
+
+# ───────────────────────────────────────────────────────────────
+# ENGINES
+# ───────────────────────────────────────────────────────────────
+def _selectolax(html: str, budget: TextBudget):
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html)
+    tree.strip_tags(list(SKIP_TAGS))
+    if tree.root is None:
+        return
+    for node in tree.root.traverse(include_text=True):
+        if node.tag == "-text" and budget.add(node.text_content):
+            return
+
+
+class _LxmlTarget:
+    """Parser target collecting text outside SKIP_TAGS; comments never reach data()."""
+
+    def __init__(self, budget: TextBudget):
+        self.budget = budget
+        self.skip_depth = 0
+        self.full = False
+
+    def start(self, tag, attrib):
+        if self.skip_depth or tag in SKIP_TAGS:
+            self.skip_depth += 1
+
+    def end(self, tag):
+        if self.skip_depth:
+            self.skip_depth -= 1
+
+    def data(self, text):
+        if not self.skip_depth and not self.full:
+            self.full = self.budget.add(text)
+
+    def close(self):
+        return None
+
+
+def _lxml(html: str, budget: TextBudget):
+    from lxml import etree
+
+    if not html:
+        return
+    target = _LxmlTarget(budget)
+    parser = etree.HTMLParser(target=target)
+    for i in range(0, len(html), FEED_CHUNK):
+        parser.feed(html[i:i + FEED_CHUNK])
+        if target.full:
+            break
+    parser.close()
+
+
+def _bs4(html: str, budget: TextBudget):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for element in soup(list(SKIP_TAGS)):
+        element.decompose()
+    budget.add(soup.get_text())
+
+
+ENGINES: dict[str, tuple[str, Callable[[str, TextBudget], None]]] = {
+    # name -> (module that must be importable, implementation)
+    "lxml": ("lxml", _lxml),
+    "selectolax": ("selectolax", _selectolax),
+    "bs4": ("bs4", _bs4),
+}
+
+
+def available_engines() -> list[str]:
+    return [name for name, (module, _) in ENGINES.items() if importlib.util.find_spec(module)]
+
+
+def default_engine() -> str:
+    return available_engines()[0]
+
+
+def extract_text(html: str, limit: int = DEFAULT_LIMIT, engine: Optional[str] = None) -> str:
+    budget = TextBudget(limit)
+    ENGINES[engine or default_engine()][1](html, budget)
+    return budget.text()
+
+
+async def extract_text_async(html: str, limit: int = DEFAULT_LIMIT, engine: Optional[str] = None) -> str:
+    """extract_text in a worker thread, so a huge page does not stall the event loop."""
+    return await asyncio.to_thread(extract_text, html, limit, engine)
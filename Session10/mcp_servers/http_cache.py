@@ -0,0 +1,252 @@
+"""
+On-disk HTTP cache for the web tools (mcp_server_2 and mcp_server_3).
+
+- Responses are stored in SQLite with their validators. Fresh entries (Cache-Control
+  max-age, Expires, or the usual 10%-of-age heuristic for Last-Modified) are served without
+  touching the network. Stale ones are revalidated with If-None-Match / If-Modified-Since,
+  and a 304 reuses the stored body. `no-store` responses are never written.
+- Text extracted from a body (markdown, plain text) is stored next to it, keyed by
+  (URL, extractor version). It is dropped when the body changes, so a revalidated page
+  skips HTML parsing as well.
+- The cache is bounded: once it grows past `max_bytes`, the least recently used URLs
+  are evicted.
+"""
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import httpx
+
+ROOT = Path(__file__).parent.resolve()
+CACHE_DB = ROOT / "cache" / "http_cache.sqlite"
+MAX_BYTES = 256 * 2 ** 20
+HEURISTIC_FRACTION = 0.1          # of (Date - Last-Modified), as in RFC 9111 4.2.2
+MAX_HEURISTIC_TTL = 24 * 3600
+STORED_HEADERS = ("content-type", "etag", "last-modified", "cache-control", "expires", "date")
+
+
+@dataclass(slots=True)
+class CachedPage:
+    url: str
+    headers: dict[str, str]
+    body: bytes
+    encoding: str
+    source: str  # "network", "cache" (fresh hit) or "revalidated" (304)
+
+    @property
+    def text(self) -> str:
+        return self.body.decode(self.encoding or "utf-8", errors="replace")
+
+
+def _cache_control(headers: dict[str, str]) -> dict[str, Optional[str]]:
+    directives = {}
+    for part in headers.get("cache-control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    try:
+        return parsedate_to_datetime(value).timestamp() if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def expires_at(headers: dict[str, str], now: float) -> Optional[float]:
+    """When a response stops being fresh; None if it must not be stored at all."""
+    cc = _cache_control(headers)
+    if "no-store" in cc:
+        return None
+    if "no-cache" in cc:
+        return now
+    if cc.get("max-age") is not None:
+        try:
+            return now + max(0, int(cc["max-age"]))
+        except ValueError:
+            return now
+    date = _timestamp(headers.get("date")) or now
+    expires = _timestamp(headers.get("expires"))
+    if expires is not None:
+        return now + max(0.0, expires - date)
+    last_modified = _timestamp(headers.get("last-modified"))
+    if last_modified is not None:
+        return now + min(MAX_HEURISTIC_TTL, max(0.0, (date - last_modified) * HEURISTIC_FRACTION))
+    return now
+
+
+class HttpCache:
+    def __init__(self, path: Path = CACHE_DB, max_bytes: int = MAX_BYTES):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                encoding TEXT,
+                body_hash TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS extracts (
+                url TEXT NOT NULL,
+                extractor TEXT NOT NULL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (url, extractor)
+            );
+            CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access);
+            """
+        )
+        self.db.commit()
+
+    # ── responses ────────────────────────────────────────────────
+    def _lookup(self, url: str) -> Optional[tuple[CachedPage, float]]:
+        with self._lock:
+            row = self.db.execute(
+                "SELECT headers, body, encoding, expires_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+            self.db.commit()
+        headers, body, encoding, expires = row
+        return CachedPage(url, json.loads(headers), body, encoding, "cache"), expires
+
+    def fresh(self, url: str) -> Optional[CachedPage]:
+        """The stored page if it can be used without revalidation."""
+        entry = self._lookup(url)
+        if entry and entry[1] > time.time():
+            return entry[0]
+        return None
+
+    def _store(self, url: str, response: httpx.Response) -> CachedPage:
+        now = time.time()
+        headers = {k: response.headers[k] for k in STORED_HEADERS if k in response.headers}
+        page = CachedPage(url, headers, response.content, response.encoding, "network")
+        expires = expires_at(headers, now)
+        if expires is None:
+            self.forget(url)
+            return page
+
+        body_hash = hashlib.sha256(page.body).hexdigest()
+        with self._lock:
+            old = self.db.execute("SELECT body_hash FROM responses WHERE url = ?", (url,)).fetchone()
+            if old and old[0] != body_hash:
+                self.db.execute("DELETE FROM extracts WHERE url = ?", (url,))
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, json.dumps(headers), page.body, page.encoding, body_hash, expires, now, len(page.body))
+            )
+            self.db.commit()
+        self._evict()
+        return page
+
+    def _refresh(self, url: str, stale: CachedPage, response: httpx.Response) -> CachedPage:
+        """Apply a 304: keep the stored body, take the new freshness headers."""
+        headers = {**stale.headers, **{k: response.headers[k] for k in STORED_HEADERS if k in response.headers}}
+        expires = expires_at(headers, time.time())
+        with self._lock:
+            self.db.execute(
+                "UPDATE responses SET headers = ?, expires_at = ? WHERE url = ?",
+                (json.dumps(headers), expires if expires is not None else 0.0, url)
+            )
+            self.db.commit()
+        return CachedPage(url, headers, stale.body, stale.encoding, "revalidated")
+
+    def _prepare(self, url: str, headers: Optional[dict]) -> tuple[Optional[CachedPage], bool, dict]:
+        entry = self._lookup(url)
+        request_headers = dict(headers or {})
+        if entry is None:
+            return None, False, request_headers
+        page, expires = entry
+        if expires > time.time():
+            return page, True, request_headers
+        if "etag" in page.headers:
+            request_headers["If-None-Match"] = page.headers["etag"]
+        if "last-modified" in page.headers:
+            request_headers["If-Modified-Since"] = page.headers["last-modified"]
+        return page, False, request_headers
+
+    def _finish(self, url: str, stale: Optional[CachedPage], response: httpx.Response) -> CachedPage:
+        if response.status_code == 304 and stale is not None:
+            return self._refresh(url, stale, response)
+        response.raise_for_status()
+        return self._store(url, response)
+
+    async def fetch(self, client: httpx.AsyncClient, url: str, headers: Optional[dict] = None) -> CachedPage:
+        page, is_fresh, request_headers = self._prepare(url, headers)
+        if is_fresh:
+            return page
+        return self._finish(url, page, await client.get(url, headers=request_headers))
+
+    def fetch_sync(self, client: httpx.Client, url: str, headers: Optional[dict] = None) -> CachedPage:
+        page, is_fresh, request_headers = self._prepare(url, headers)
+        if is_fresh:
+            return page
+        return self._finish(url, page, client.get(url, headers=request_headers))
+
+    def forget(self, url: str):
+        with self._lock:
+            self.db.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self.db.execute("DELETE FROM extracts WHERE url = ?", (url,))
+            self.db.commit()
+
+    def _evict(self):
+        with self._lock:
+            total = self.db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0] + self.db.execute(
+                "SELECT COALESCE(SUM(LENGTH(CAST(text AS BLOB))), 0) FROM extracts"
+            ).fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            target = total - int(self.max_bytes * 0.9)
+            victims, freed = [], 0
+            for url, size in self.db.execute("SELECT url, size FROM responses ORDER BY last_access"):
+                victims.append((url,))
+                freed += size
+                if freed >= target:
+                    break
+            self.db.executemany("DELETE FROM responses WHERE url = ?", victims)
+            self.db.executemany("DELETE FROM extracts WHERE url = ?", victims)
+            self.db.commit()
+
+    # ── extracted text ───────────────────────────────────────────
+    def get_text(self, url: str, extractor: str) -> Optional[str]:
+        with self._lock:
+            row = self.db.execute(
+                "SELECT text FROM extracts WHERE url = ? AND extractor = ?", (url, extractor)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_text(self, url: str, extractor: str, text: str):
+        with self._lock:
+            if self.db.execute("SELECT 1 FROM responses WHERE url = ?", (url,)).fetchone() is None:
+                return  # body was not cacheable, so neither is its extract
+            self.db.execute("INSERT OR REPLACE INTO extracts VALUES (?, ?, ?)", (url, extractor, text))
+            self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+_cache: Optional[HttpCache] = None
+
+
+def http_cache() -> HttpCache:
+    global _cache
+    if _cache is None:
+        _cache = HttpCache()
+    return _cache
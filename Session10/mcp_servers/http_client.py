@@ -0,0 +1,49 @@
+"""
+One long-lived httpx.AsyncClient per MCP server process.
+
+- Keep-alive connection pooling, so requests from the same process reuse warm TCP/TLS
+  connections instead of paying the handshake on every request.
+- HTTP/2 when the optional `h2` package is installed (`pip install httpx[http2]`).
+- `close_http_client()` is meant for the server's lifespan, so sockets close cleanly on shutdown.
+
+Limit: MultiMCP starts a fresh stdio server for every tool call, so the pool only lives
+for one call. It pays off within a call (duckduckgo_multi_search fan-out, redirects,
+revalidations) and for servers run persistently, not across the agent's tool calls.
+DNS lookups are left to the OS resolver for the same reason.
+"""
+import importlib.util
+from typing import Optional
+
+import httpx
+
+HTTP2 = importlib.util.find_spec("h2") is not None
+LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60.0)
+TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(http2=HTTP2, limits=LIMITS, timeout=TIMEOUT, follow_redirects=True)
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+_sync_client: Optional[httpx.Client] = None
+
+
+def get_sync_http_client() -> httpx.Client:
+    """Pooled client for the synchronous tools (mcp_server_2)."""
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        _sync_client = httpx.Client(http2=HTTP2, limits=LIMITS, timeout=TIMEOUT, follow_redirects=True)
+    return _sync_client
@@ -13,10 +13,12 @@ from pathlib import Path
 import requests
 import subprocess
 import sqlite3
-from io import StringIO
+from io import StringIO, BytesIO
 from tqdm import tqdm
 import hashlib
 
+from blob_store import offload
+
 # Models
 from models import (
     AddInput, AddOutput,
@@ -121,7 +123,11 @@ def create_thumbnail(input: CreateThumbnailInput) -> ImageOutput:
     print("CALLED: create_thumbnail(CreateThumbnailInput) -> ImageOutput")
     img = PILImage.open(input.image_path)
     img.thumbnail((100, 100))
-    return ImageOutput(data=img.tobytes(), format="png")
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    # The PNG goes to the session blob store; only its handle goes back over JSON-RPC
+    handle = offload(buffer.getvalue(), media_type="image/png", preview=f"PNG thumbnail {img.width}x{img.height} of {Path(input.image_path).name}")
+    return ImageOutput(image=handle, format="png")
 
 @mcp.tool()
 def strings_to_chars_to_int(input: StringsToIntsInput) -> StringsToIntsOutput:
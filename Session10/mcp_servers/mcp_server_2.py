@@ -1,26 +1,30 @@
-from mcp.server.fastmcp import FastMCP, Image
+from mcp.server.fastmcp import FastMCP, Image, Context
 from mcp.server.fastmcp.prompts import base
 from mcp.types import TextContent
 from mcp import types
 from PIL import Image as PILImage
 import math
 import sys
+import asyncio
 import os
 import json
 import faiss
 import numpy as np
 from pathlib import Path
 import requests
-from markitdown import MarkItDown
 import time
-from models import AddInput, AddOutput, SqrtInput, SqrtOutput, StringsToIntsInput, StringsToIntsOutput, ExpSumInput, ExpSumOutput, PythonCodeInput, PythonCodeOutput, UrlInput, FilePathInput, MarkdownInput, MarkdownOutput, ChunkListOutput, SearchDocumentsInput
+from models import AddInput, AddOutput, SqrtInput, SqrtOutput, StringsToIntsInput, StringsToIntsOutput, ExpSumInput, ExpSumOutput, PythonCodeInput, PythonCodeOutput, UrlInput, FilePathInput, MarkdownInput, MarkdownOutput, ChunkListOutput, SearchDocumentsInput, PdfPagesInput, PdfPage, PdfPagesOutput
 from tqdm import tqdm
 import hashlib
 from pydantic import BaseModel
 import subprocess
 import sqlite3
 import trafilatura
-import pymupdf4llm
+import httpx
+from http_cache import http_cache
+from http_client import get_sync_http_client
+from extractors import PDF_EXTRACTOR_VERSION, convert_document, extract_pdf_pages, iter_pdf_pages, pdf_page_count
+from blob_store import offload
 import re
 import base64 # ollama needs base64-encoded-image
 
@@ -39,6 +43,7 @@ CHUNK_OVERLAP = 40
 MAX_CHUNK_LENGTH = 512  # characters
 TOP_K = 3  # FAISS top-K matches
 ROOT = Path(__file__).parent.resolve()
+WEB_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
 
 
 def get_embedding(text: str) -> np.ndarray:
@@ -117,6 +122,10 @@ def search_stored_documents_rag(input: SearchDocumentsInput) -> list[str]:
         return [f"ERROR: Failed to search: {str(e)}"]
 
 
+class CaptionError(Exception):
+    """Captioning failed, possibly only for now; str(e) is the placeholder shown instead."""
+
+
 def caption_image(img_url_or_path: str) -> str:
     mcp_log("CAPTION", f"🖼️ Attempting to caption image: {img_url_or_path}")
 
@@ -125,7 +134,7 @@ def caption_image(img_url_or_path: str) -> str:
 
     if not full_path.exists():
         mcp_log("ERROR", f"❌ Image file not found: {full_path}")
-        return f"[Image file not found: {img_url_or_path}]"
+        raise CaptionError(f"[Image file not found: {img_url_or_path}]")
 
     try:
         if img_url_or_path.startswith("http"): # for extract_web_pages
@@ -157,21 +166,32 @@ def caption_image(img_url_or_path: str) -> str:
 
             caption = "".join(caption_parts).strip()
             mcp_log("CAPTION", f"✅ Caption generated: {caption}")
-            return caption if caption else "[No caption returned]"
+            if not caption:
+                raise CaptionError("[No caption returned]")
+            return caption
 
+    except CaptionError:
+        raise
     except Exception as e:
         mcp_log("ERROR", f"⚠️ Failed to caption image {img_url_or_path}: {e}")
-        return f"[Image could not be processed: {img_url_or_path}]"
+        raise CaptionError(f"[Image could not be processed: {img_url_or_path}]")
 
 
 
 
 
-def replace_images_with_captions(markdown: str) -> str:
+def replace_images_with_captions(markdown: str) -> tuple[str, bool]:
+    """Markdown with every image replaced by its caption, and whether all captions succeeded."""
+    failed = []
+
     def replace(match):
         alt, src = match.group(1), match.group(2)
         try:
-            caption = caption_image(src)
+            try:
+                caption = caption_image(src)
+            except CaptionError as e:
+                failed.append(src)
+                caption = str(e)
             # Attempt to delete only if local and file exists
             if not src.startswith("http"):
                 img_path = Path(__file__).parent / "documents" / src
@@ -183,27 +203,58 @@ def replace_images_with_captions(markdown: str) -> str:
             mcp_log("WARN", f"Image deletion failed: {e}")
             return f"[Image could not be processed: {src}]"
 
-    return re.sub(r'!\[(.*?)\]\((.*?)\)', replace, markdown)
+    markdown = re.sub(r'!\[(.*?)\]\((.*?)\)', replace, markdown)
+    return markdown, not failed
+
+
+# Cached webpage markdown is the extraction before captioning, so a failed caption is retried
+WEBPAGE_MARKDOWN_VERSION = f"trafilatura-{trafilatura.__version__}"
 
 
 @mcp.tool()
 def convert_webpage_url_into_markdown(input: UrlInput) -> MarkdownOutput:
     """Return clean webpage content without Ads, and clutter. """
 
-    downloaded = trafilatura.fetch_url(input.url)
-    if not downloaded:
+    # Pages come from the on-disk HTTP cache when fresh, or are revalidated with ETag/Last-Modified
+    cache = http_cache()
+    try:
+        page = cache.fetch_sync(get_sync_http_client(), input.url, headers=WEB_HEADERS)
+    except httpx.HTTPError as e:
+        mcp_log("WARN", f"Download failed for {input.url}: {e}")
         return MarkdownOutput(markdown="Failed to download the webpage.")
 
-    markdown = trafilatura.extract(
-        downloaded,
-        include_comments=False,
-        include_tables=True,
-        include_images=True,
-        output_format='markdown'
-    ) or ""
+    markdown = cache.get_text(input.url, WEBPAGE_MARKDOWN_VERSION)
+    if markdown is None:
+        markdown = trafilatura.extract(
+            page.body,
+            include_comments=False,
+            include_tables=True,
+            include_images=True,
+            output_format='markdown'
+        ) or ""
+        cache.put_text(input.url, WEBPAGE_MARKDOWN_VERSION, markdown)
+
+    markdown, _ = replace_images_with_captions(markdown)
+    # Long pages go to the session blob store; the agent gets a handle with a preview
+    return MarkdownOutput(markdown=offload(markdown, media_type="text/markdown"))
+
+# Cached PDF pages include image captions, so the caption model is part of the version.
+# "+complete": pages with a failed caption are no longer cached; older entries may hold one.
+PDF_PAGE_VERSION = f"{PDF_EXTRACTOR_VERSION}+captions:{GEMMA_MODEL}+complete"
+
+
+def finish_pdf_page(markdown: str) -> tuple[str, bool]:
+    """
+    Re-point image links at documents/images and replace the images with captions.
+    A page with a failed caption is not complete, so iter_pdf_pages does not cache it.
+    """
+    markdown = re.sub(
+        r'!\[\]\((.*?/images/)([^)]+)\)',
+        r'![](images/\2)',
+        markdown.replace("\\", "/")
+    )
+    return replace_images_with_captions(markdown)
 
-    markdown = replace_images_with_captions(markdown)
-    return MarkdownOutput(markdown=markdown)
 
 @mcp.tool()
 def extract_pdf(input: FilePathInput) -> MarkdownOutput:
@@ -217,22 +268,59 @@ def extract_pdf(input: FilePathInput) -> MarkdownOutput:
     global_image_dir = ROOT / "documents" / "images"
     global_image_dir.mkdir(parents=True, exist_ok=True)
 
-    # Actual markdown with relative image paths
-    markdown = pymupdf4llm.to_markdown(
+    # Pages are extracted in parallel page ranges and cached per (file hash, page, version)
+    pages = extract_pdf_pages(
         input.file_path,
-        write_images=True,
-        image_path=str(global_image_dir)
+        image_dir=global_image_dir,
+        postprocess=finish_pdf_page,
+        version=PDF_PAGE_VERSION
     )
+    return MarkdownOutput(markdown=offload("\n\n".join(pages.values()), media_type="text/markdown"))
 
-    # Re-point image links in the markdown
-    markdown = re.sub(
-        r'!\[\]\((.*?/images/)([^)]+)\)',
-        r'![](images/\2)',
-        markdown.replace("\\", "/")
+
+@mcp.tool()
+async def read_pdf_pages(input: PdfPagesInput, ctx: Context) -> PdfPagesOutput:
+    """Read a page range of a PDF as markdown, one page at a time. Stops after max_chars or at the page containing stop_at; call again with start_page=next_page to continue. """
+
+    if not os.path.exists(input.file_path):
+        raise ValueError(f"File not found: {input.file_path}")
+
+    global_image_dir = ROOT / "documents" / "images"
+    global_image_dir.mkdir(parents=True, exist_ok=True)
+
+    total = await asyncio.to_thread(pdf_page_count, input.file_path)
+    last = min(input.end_page or total, total)
+    wanted = range(input.start_page, last + 1)
+    output = PdfPagesOutput(pages=[], total_pages=total)
+
+    # Pages are produced (and captioned) lazily: stopping early skips the rest of the range
+    pages = iter_pdf_pages(
+        input.file_path,
+        wanted,
+        image_dir=global_image_dir,
+        postprocess=finish_pdf_page,
+        version=PDF_PAGE_VERSION
     )
+    chars = 0
+    stop_at = input.stop_at.lower() if input.stop_at else None
+    try:
+        while (item := await asyncio.to_thread(next, pages, None)) is not None:
+            page, markdown = item
+            output.pages.append(PdfPage(page=page, markdown=markdown))
+            chars += len(markdown)
+            await ctx.report_progress(len(output.pages), len(wanted))
+            await ctx.info(f"[page {page}/{total}]\n{markdown}")
+
+            if chars >= input.max_chars or (stop_at and stop_at in markdown.lower()):
+                output.next_page = page + 1 if page < last else None
+                break
+    finally:
+        try:
+            pages.close()  # cancels pool batches for pages nobody asked for
+        except ValueError:
+            pass  # cancelled mid-page: the worker thread still owns the generator
 
-    markdown = replace_images_with_captions(markdown)
-    return MarkdownOutput(markdown=markdown)
+    return output
 
 
 def semantic_merge(text: str) -> list[str]:
@@ -343,10 +431,9 @@ def process_documents():
                 markdown = extract_webpage(UrlInput(url=file.read_text().strip())).markdown
 
             else:
-                # Fallback to MarkItDown for other formats
-                converter = MarkItDown()
+                # Fallback to the shared MarkItDown converter for other formats
                 mcp_log("INFO", f"Using MarkItDown fallback for {file.name}")
-                markdown = converter.convert(str(file)).text_content
+                markdown = convert_document(file)
 
             if not markdown.strip():
                 mcp_log("WARN", f"No content extracted from {file.name}")
@@ -7,12 +7,16 @@ import urllib.parse
 import sys
 import traceback
 import asyncio
-from datetime import datetime, timedelta
 import time
 import re
+from contextlib import asynccontextmanager
 from pydantic import BaseModel, Field
-from models import SearchInput, UrlInput
+from models import SearchInput, MultiSearchInput, UrlInput
 from models import PythonCodeOutput  # Import the models we need
+from http_client import get_http_client, close_http_client
+from rate_limit import HostLimit, HostRateLimiter
+from http_cache import http_cache
+from html_text import default_engine, extract_text_async
 
 
 @dataclass
@@ -23,25 +27,47 @@ class SearchResult:
     position: int
 
 
-class RateLimiter:
-    def __init__(self, requests_per_minute: int = 30):
-        self.requests_per_minute = requests_per_minute
-        self.requests = []
+MAX_TEXT_CHARS = 8000
+RRF_K = 60  # reciprocal rank fusion constant
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ref_src")
 
-    async def acquire(self):
-        now = datetime.now()
-        # Remove requests older than 1 minute
-        self.requests = [
-            req for req in self.requests if now - req < timedelta(minutes=1)
-        ]
 
-        if len(self.requests) >= self.requests_per_minute:
-            # Wait until we can make another request
-            wait_time = 60 - (now - self.requests[0]).total_seconds()
-            if wait_time > 0:
-                await asyncio.sleep(wait_time)
+def canonical_url(url: str) -> str:
+    """URL key for de-duplication: no fragment, tracking params, www. or trailing slash."""
+    parts = urllib.parse.urlsplit(url.strip())
+    host = (parts.hostname or "").lower().removeprefix("www.")
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS)
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urllib.parse.urlunsplit(("", host, path, urllib.parse.urlencode(query), ""))
 
-        self.requests.append(now)
+
+def fuse_results(result_lists: List[List[SearchResult]], max_results: int) -> List[SearchResult]:
+    """Merge per-query results by canonical URL, ranked by reciprocal rank fusion."""
+    scores: Dict[str, float] = {}
+    best: Dict[str, SearchResult] = {}
+    for results in result_lists:
+        for result in results:
+            key = canonical_url(result.link)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + result.position)
+            if key not in best or result.position < best[key].position:
+                best[key] = result
+    ranked = sorted(scores, key=scores.get, reverse=True)[:max_results]
+    return [
+        SearchResult(title=best[key].title, link=best[key].link, snippet=best[key].snippet, position=i)
+        for i, key in enumerate(ranked, start=1)
+    ]
+
+
+# Shared by search and fetch, so all web traffic from this server is limited per host
+RATE_LIMITS = HostRateLimiter(
+    default=HostLimit(requests_per_minute=20, burst=5),
+    limits={"html.duckduckgo.com": HostLimit(requests_per_minute=30, burst=5)},
+)
 
 
 class DuckDuckGoSearcher:
@@ -50,8 +76,8 @@ class DuckDuckGoSearcher:
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
     }
 
-    def __init__(self):
-        self.rate_limiter = RateLimiter()
+    def __init__(self, rate_limiter: HostRateLimiter = RATE_LIMITS):
+        self.rate_limiter = rate_limiter
 
     def format_results_for_llm(self, results: List[SearchResult]) -> str:
         """Format results in a natural language style that's easier for LLMs to process"""
@@ -74,7 +100,9 @@ class DuckDuckGoSearcher:
     ) -> List[SearchResult]:
         try:
             # Apply rate limiting
-            await self.rate_limiter.acquire()
+            waited = await self.rate_limiter.acquire(self.BASE_URL)
+            if waited:
+                await ctx.info(f"Rate limited: waited {waited:.1f}s")
 
             # Create form data for POST request
             data = {
@@ -85,11 +113,10 @@ class DuckDuckGoSearcher:
 
             await ctx.info(f"Searching DuckDuckGo for: {query}")
 
-            async with httpx.AsyncClient() as client:
-                result = await client.post(
-                    self.BASE_URL, data=data, headers=self.HEADERS, timeout=30.0
-                )
-                result.raise_for_status()
+            result = await get_http_client().post(
+                self.BASE_URL, data=data, headers=self.HEADERS
+            )
+            result.raise_for_status()
 
             # Parse HTML result
             soup = BeautifulSoup(result.text, "html.parser")
@@ -149,48 +176,35 @@ class DuckDuckGoSearcher:
 
 
 class WebContentFetcher:
-    def __init__(self):
-        self.rate_limiter = RateLimiter(requests_per_minute=20)
+    HEADERS = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+    }
+
+    def __init__(self, rate_limiter: HostRateLimiter = RATE_LIMITS, engine: Optional[str] = None):
+        self.rate_limiter = rate_limiter
+        self.engine = engine or default_engine()
+        self.extractor = f"{self.engine}-text-v1"  # cache key; bump when html_text output changes
 
     async def fetch_and_parse(self, url: str, ctx: Context) -> str:
         """Fetch and parse content from a webpage"""
         try:
-            await self.rate_limiter.acquire()
-
-            await ctx.info(f"Fetching content from: {url}")
-
-            async with httpx.AsyncClient() as client:
-                result = await client.get(
-                    url,
-                    headers={
-                        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                    },
-                    follow_redirects=True,
-                    timeout=30.0,
-                )
-                result.raise_for_status()
-
-            # Parse the HTML
-            soup = BeautifulSoup(result.text, "html.parser")
-
-            # Remove script and style elements
-            for element in soup(["script", "style", "nav", "header", "footer"]):
-                element.decompose()
-
-            # Get the text content
-            text = soup.get_text()
-
-            # Clean up the text
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = " ".join(chunk for chunk in chunks if chunk)
-
-            # Remove extra whitespace
-            text = re.sub(r"\s+", " ", text).strip()
-
-            # Truncate if too long
-            if len(text) > 8000:
-                text = text[:8000] + "... [content truncated]"
+            cache = http_cache()
+            page = cache.fresh(url)
+            if page is None:
+                waited = await self.rate_limiter.acquire(url)
+                if waited:
+                    await ctx.info(f"Rate limited: waited {waited:.1f}s")
+
+                await ctx.info(f"Fetching content from: {url}")
+                page = await cache.fetch(get_http_client(), url, headers=self.HEADERS)
+
+            # Parsed text is cached next to the body and reused until the body changes
+            text = cache.get_text(url, self.extractor)
+            if text is None:
+                text = await extract_text_async(page.text, MAX_TEXT_CHARS, self.engine)
+                cache.put_text(url, self.extractor, text)
+            else:
+                await ctx.info(f"Using cached content ({page.source})")
 
             await ctx.info(
                 f"Successfully fetched and parsed content ({len(text)} characters)"
@@ -208,8 +222,19 @@ class WebContentFetcher:
             return f"Error: An unexpected error occurred while fetching the webpage ({str(e)})"
 
 
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    # One pooled HTTP client for the whole server process, closed on shutdown
+    try:
+        yield {}
+    finally:
+        await close_http_client()
+        if RATE_LIMITS.buckets:
+            print(f"Rate limiter waits per host: {RATE_LIMITS.stats()}", file=sys.stderr)
+
+
 # Initialize FastMCP server
-mcp = FastMCP("ddg-search")
+mcp = FastMCP("ddg-search", lifespan=lifespan)
 searcher = DuckDuckGoSearcher()
 fetcher = WebContentFetcher()
 
@@ -225,6 +250,20 @@ async def duckduckgo_search_results(input: SearchInput, ctx: Context) -> PythonC
         return f"An error occurred while searching: {str(e)}"
 
 
+@mcp.tool()
+async def duckduckgo_multi_search(input: MultiSearchInput, ctx: Context) -> PythonCodeOutput:
+    """Search DuckDuckGo for several phrasings at once; results are merged, de-duplicated and ranked. """
+    try:
+        queries = list(dict.fromkeys(q.strip() for q in input.queries if q.strip()))
+        result_lists = await asyncio.gather(*(searcher.search(q, ctx, input.max_results) for q in queries))
+        results = fuse_results(result_lists, input.max_results)
+        await ctx.info(f"Merged {sum(map(len, result_lists))} results from {len(queries)} queries into {len(results)}")
+        return PythonCodeOutput(result=searcher.format_results_for_llm(results))
+    except Exception as e:
+        traceback.print_exc(file=sys.stderr)
+        return f"An error occurred while searching: {str(e)}"
+
+
 @mcp.tool()
 async def download_raw_html_from_url(input: UrlInput, ctx: Context) -> PythonCodeOutput:
     """Fetch webpage content. """
@@ -1,5 +1,13 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional, Union
+
+# --- Blob Handles (blob_store.py) ---
+
+class BlobHandle(BaseModel):
+    blob: str = Field(description="sha256 of the content")
+    media_type: str
+    size: int
+    preview: str = ""
 
 # --- Math Tools ---
 
@@ -116,7 +124,7 @@ class CreateThumbnailInput(BaseModel):
     image_path: str
 
 class ImageOutput(BaseModel):
-    data: bytes
+    image: BlobHandle
     format: str
 
 # --- Shell, Python, SQL Tools ---
@@ -142,11 +150,27 @@ class MarkdownInput(BaseModel):
     text: str
 
 class MarkdownOutput(BaseModel):
-    markdown: str
+    markdown: Union[str, BlobHandle]
 
 class ChunkListOutput(BaseModel):
     chunks: List[str]
 
+class PdfPagesInput(BaseModel):
+    file_path: str
+    start_page: int = Field(default=1, ge=1, description="First page to read (1-based)")
+    end_page: Optional[int] = Field(default=None, description="Last page to read (inclusive); default: last page of the PDF")
+    max_chars: int = Field(default=20000, description="Stop after this many characters; continue from next_page")
+    stop_at: Optional[str] = Field(default=None, description="Stop after the first page containing this text (case-insensitive)")
+
+class PdfPage(BaseModel):
+    page: int
+    markdown: str
+
+class PdfPagesOutput(BaseModel):
+    pages: List[PdfPage]
+    total_pages: int
+    next_page: Optional[int] = Field(default=None, description="Page to pass as start_page to keep reading; None when the range is done")
+
 # --- Memory Search ---
 
 class SearchMemoryInput(BaseModel):
@@ -161,6 +185,10 @@ class SearchInput(BaseModel):
     query: str
     max_results: int = Field(default=10, description="Maximum number of results to return")
 
+class MultiSearchInput(BaseModel):
+    queries: List[str] = Field(description="Phrasings of the search, run concurrently")
+    max_results: int = Field(default=10, description="Maximum number of merged results to return")
+
 class SearchDocumentsInput(BaseModel):
     query: str
 
@@ -171,4 +199,4 @@ class FilePathInput(BaseModel):
     file_path: str
 
 class MarkdownOutput(BaseModel):
-    markdown: str
+    markdown: Union[str, BlobHandle]
@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 import asyncio
 import json
 from typing import Optional, Any, List, Dict
@@ -7,6 +8,8 @@ from inspect import signature
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 import ast
+from agent.tracing import span
+from mcp_servers.blob_store import BLOB_DIR_ENV, hydrate, resolve, session_store
 
 class MCP:
     def __init__(
@@ -47,6 +50,7 @@ class MultiMCP:
         self.server_configs = server_configs
         self.tool_map: Dict[str, Dict[str, Any]] = {}
         self.server_tools: Dict[str, List[Any]] = {}
+        self._description_cache: Optional[tuple] = None
 
     async def initialize(self):
         print("in MultiMCP initialize")
@@ -90,20 +94,26 @@ class MultiMCP:
         params = StdioServerParameters(
             command=sys.executable,
             args=[config["script"]],
-            cwd=config.get("cwd", os.getcwd())
+            cwd=config.get("cwd", os.getcwd()),
+            env={BLOB_DIR_ENV: str(session_store().root)}  # large results land in this session's blob store
         )
 
-        async with stdio_client(params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                return await session.call_tool(tool_name, arguments)
+        with span("mcp.call_tool", tool=tool_name, server=config.get("id")) as trace:
+            started = time.perf_counter()
+            async with stdio_client(params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    trace.set(spawn_ms=round((time.perf_counter() - started) * 1000, 3))
+                    result = await session.call_tool(tool_name, arguments)
+                    trace.set(is_error=bool(getattr(result, "isError", False)))
+                    return result
 
 
 
     async def function_wrapper(self, tool_name: str, *args):
         """
         Call a tool like a function with positional args OR a single string like 'add(45, 55)'.
-        Returns the most relevant parsed result.
+        Returns the most relevant parsed result; large results come back as BlobRef handles.
         """
         # ── Handle LLM-style string input like: "add(45, 55) or ("send_email", ("a@b.com", "hello"))" ─────────────────
         # ── Handle string-form function call like "add(10, 20)" ──────────────
@@ -144,11 +154,12 @@ class MultiMCP:
             params = dict(zip(param_names, args))
 
         # ── Call and Normalize Output ────────────────────────
-        result = await self.call_tool(tool_name, params)
+        # Blob handles passed back in as arguments are sent as their content
+        result = await self.call_tool(tool_name, resolve(params))
 
         try:
             content_text = getattr(result, "content", [])[0].text.strip()
-            parsed = json.loads(content_text)
+            parsed = hydrate(json.loads(content_text))  # blob handles -> BlobRef (preview, loaded on use)
 
             if isinstance(parsed, dict):
                 if "result" in parsed:
@@ -163,8 +174,19 @@ class MultiMCP:
 
 
 
+    def tool_catalog_key(self) -> tuple:
+        """Identity of the registered tool set; changes whenever tool_map gains, loses or replaces a tool."""
+        return tuple((name, id(entry["tool"])) for name, entry in self.tool_map.items())
+
     def tool_description_wrapper(self) -> List[str]:
-        """Format tool usage as: tool(type, type)  # description"""
+        """Format tool usage as: tool(type, type)  # description
+
+        The rendered list is cached until tool_map changes.
+        """
+        key = self.tool_catalog_key()
+        if self._description_cache and self._description_cache[0] == key:
+            return self._description_cache[1]
+
         examples = []
         for tool in self.get_all_tools():
             schema = tool.inputSchema
@@ -181,6 +203,7 @@ class MultiMCP:
 
             signature_str = ", ".join(arg_types)
             examples.append(f"{tool.name}({signature_str})  # {tool.description}")
+        self._description_cache = (key, examples)
         return examples
 
 
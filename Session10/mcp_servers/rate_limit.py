@@ -0,0 +1,93 @@
+"""
+Async rate limiting for the web tools: one GCRA token bucket per host.
+
+GCRA keeps a single "theoretical arrival time" per bucket, so acquire() is O(1). Each
+caller reserves its slot under a lock and then sleeps outside it. Concurrent callers
+therefore queue up in arrival order at the configured rate instead of all passing the
+check and sleeping together.
+"""
+import time
+import asyncio
+import urllib.parse
+from dataclasses import dataclass, field
+
+
+@dataclass(slots=True)
+class LimiterStats:
+    requests: int = 0
+    delayed: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    def record(self, wait: float):
+        self.requests += 1
+        if wait > 0:
+            self.delayed += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "delayed": self.delayed,
+            "total_wait_s": round(self.total_wait, 3),
+            "avg_wait_s": round(self.total_wait / self.requests, 3) if self.requests else 0.0,
+            "max_wait_s": round(self.max_wait, 3),
+        }
+
+
+class TokenBucket:
+    """`requests_per_minute` sustained, with up to `burst` requests back to back."""
+
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        self.interval = 60.0 / requests_per_minute
+        self.burst = max(1, burst)
+        self.stats = LimiterStats()
+        self._tat = 0.0  # theoretical arrival time of the next request
+        self._lock = asyncio.Lock()
+
+    def _reserve(self) -> float:
+        now = time.monotonic()
+        tat = max(self._tat, now)
+        wait = max(0.0, tat - (self.burst - 1) * self.interval - now)
+        self._tat = tat + self.interval
+        return wait
+
+    async def acquire(self) -> float:
+        """Wait for a slot; returns the seconds waited."""
+        async with self._lock:
+            wait = self._reserve()
+        self.stats.record(wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+@dataclass(slots=True)
+class HostLimit:
+    requests_per_minute: float
+    burst: int = 1
+
+
+@dataclass
+class HostRateLimiter:
+    """
+    Token bucket per host. Hosts listed in `limits` get their own rate and burst;
+    every other host gets a bucket with the `default` settings.
+    """
+    default: HostLimit
+    limits: dict[str, HostLimit] = field(default_factory=dict)
+    buckets: dict[str, TokenBucket] = field(default_factory=dict)
+
+    def bucket(self, host: str) -> TokenBucket:
+        if host not in self.buckets:
+            limit = self.limits.get(host, self.default)
+            self.buckets[host] = TokenBucket(limit.requests_per_minute, limit.burst)
+        return self.buckets[host]
+
+    async def acquire(self, url: str) -> float:
+        host = urllib.parse.urlsplit(url).hostname or url
+        return await self.bucket(host.lower()).acquire()
+
+    def stats(self) -> dict[str, dict]:
+        return {host: bucket.stats.as_dict() for host, bucket in self.buckets.items()}
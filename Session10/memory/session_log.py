@@ -1,6 +1,6 @@
-import json
 from pathlib import Path
 from datetime import datetime
+from agent.tracing import annotate, traced
 
 
 def get_store_path(session_id: str, base_dir: str = "memory/session_logs") -> Path:
@@ -24,36 +24,29 @@ def simplify_session_id(session_id: str) -> str:
 
 def append_session_to_store(session_obj, base_dir: str = "memory/session_logs") -> None:
     """
-    Save the session object as a standalone file. If a file already exists and is corrupt,
-    it will be overwritten with fresh data.
+    Save the session object as a standalone file, overwriting any earlier version.
+    The document comes from the session's cached per-step fragments, so only steps
+    changed since the last update are encoded again.
     """
-    session_data = session_obj.to_json()
-    session_data["_session_id_short"] = simplify_session_id(session_data["session_id"])
-
-    store_path = get_store_path(session_data["session_id"], base_dir)
-
-    if store_path.exists():
-        try:
-            with open(store_path, "r", encoding="utf-8") as f:
-                existing = f.read().strip()
-                if existing:
-                    json.loads(existing)  # verify valid JSON
-        except json.JSONDecodeError:
-            print(f"⚠️ Warning: Corrupt JSON detected in {store_path}. Overwriting.")
-
-    with open(store_path, "w", encoding="utf-8") as f:
-        json.dump(session_data, f, indent=2)
+    store_path = get_store_path(session_obj.session_id, base_dir)
+    payload = session_obj.to_json_bytes({"_session_id_short": simplify_session_id(session_obj.session_id)})
+    annotate(bytes=len(payload))
+    with open(store_path, "wb") as f:
+        f.write(payload)
 
     print(f"✅ Session stored: {store_path}")
 
 
+@traced("session_log.update")
 def live_update_session(session_obj, base_dir: str = "memory/session_logs") -> None:
     """
     Update (or overwrite) the session file with latest data.
     In per-file format, this is identical to append.
     """
+    annotate(session_id=session_obj.session_id)
     try:
         append_session_to_store(session_obj, base_dir)
         print("📝 Session live-updated.")
     except Exception as e:
+        annotate(error=f"{type(e).__name__}: {e}")
         print(f"❌ Failed to update session: {e}")
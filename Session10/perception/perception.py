@@ -1,24 +1,41 @@
-import os
 import json
 import uuid
 import datetime
 from pathlib import Path
-from dotenv import load_dotenv
-from google import genai
-from google.genai.errors import ServerError
+from agent.llm_gateway import LLMGateway, LLMUnavailableError, get_gateway
+from agent.prompt_cache import PromptTemplate
+from agent.llm_cache import ResponseCache, get_response_cache
+from agent.tracing import annotate, traced
 
-load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY")
-client = genai.Client(api_key=api_key)
+# Fields surfaced to the caller as soon as they are complete in a streamed response
+PARTIAL_FIELDS = ("original_goal_achieved", "local_goal_achieved", "solution_summary")
+
+# Every PerceptionSnapshot field, with the value used when the model leaves it out
+REQUIRED_FIELDS = {
+    "entities": [],
+    "result_requirement": "No requirement specified.",
+    "original_goal_achieved": False,
+    "reasoning": "No reasoning given.",
+    "local_goal_achieved": False,
+    "local_reasoning": "No local reasoning given.",
+    "last_tooluse_summary": "None",
+    "solution_summary": "No summary.",
+    "confidence": "0.0"
+}
+
+
+def fallback_perception(**values) -> dict:
+    """Perception used when the model gave no usable answer: nothing is achieved."""
+    return {**REQUIRED_FIELDS, **values}
 
 class Perception:
-    def __init__(self, perception_prompt_path: str, api_key: str | None = None, model: str = "gemini-2.0-flash"):
-        load_dotenv()
-        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment or explicitly provided.")
-        self.client = genai.Client(api_key=self.api_key)
+    def __init__(self, perception_prompt_path: str, model: str = "gemini-2.0-flash", stream: bool = False, gateway: LLMGateway | None = None, cache: ResponseCache | None = None):
+        self.gateway = gateway or get_gateway()
+        self.cache = cache or get_response_cache()
+        self.model = model
         self.perception_prompt_path = perception_prompt_path
+        self.template = PromptTemplate(perception_prompt_path)
+        self.stream = stream
 
     def build_perception_input(self, raw_input: str, memory: list, current_plan = "", snapshot_type: str = "user_query") -> dict:
         if memory:
@@ -44,29 +61,45 @@ class Perception:
             "current_plan" : current_plan or "Inain Query Mode, plan not created"
         }
     
-    def run(self, perception_input: dict) -> dict:
-        """Run perception on given input using the specified prompt file."""
-        prompt_template = Path(self.perception_prompt_path).read_text(encoding="utf-8")
-        full_prompt = f"{prompt_template.strip()}\n\n```json\n{json.dumps(perception_input, indent=2)}\n```"
+    @traced("perception.run")
+    async def run(self, perception_input: dict, on_partial=None) -> dict:
+        """Run perception on given input using the specified prompt file.
+
+        In streaming mode the generation is cut off once the JSON block closes, and
+        `on_partial(field, value)` is called for PARTIAL_FIELDS as they arrive.
+        """
+        prefix = f"{self.template.text}\n\n"
+        prefix_key = (self.template.digest, "")
+        payload = f"```json\n{json.dumps(perception_input, indent=2)}\n```"
+
+        # Only perceptions of the user query are cached; step results are judged afresh
+        cacheable = self.cache is not None and perception_input.get("snapshot_type") == "user_query"
+        similarity_text = perception_input.get("raw_input") if cacheable else None
+        annotate(snapshot_type=perception_input.get("snapshot_type"))
+        if cacheable:
+            cached = await self.cache.get("perception", prefix_key, perception_input, similarity_text)
+            annotate(cache_hit=cached is not None)
+            if cached is not None:
+                return cached
 
         try:
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=full_prompt
+            raw_text = await self.gateway.generate(
+                payload,
+                prefix=prefix,
+                prefix_key=prefix_key,
+                model=self.model,
+                stream=self.stream,
+                watch_fields=PARTIAL_FIELDS,
+                on_partial=on_partial
+            )
+        except LLMUnavailableError as e:
+            print(f"🚫 Perception LLM unavailable: {e}")
+            return fallback_perception(
+                result_requirement="N/A",
+                reasoning=f"Perception model unavailable: {e}",
+                local_reasoning="Could not evaluate the input.",
+                solution_summary="Not ready yet"
             )
-        except ServerError as e:
-            print(f"🚫 Perception LLM ServerError: {e}")
-            return {
-                "step_index": 0,
-                "description": "Perception model unavailable: server overload.",
-                "type": "NOP",
-                "code": "",
-                "conclusion": "",
-                "plan_text": ["Step 0: Perception model returned a 503. Exiting to avoid loop."],
-                "raw_text": str(e)
-            }
-
-        raw_text = response.text.strip()
 
         try:
             json_block = raw_text.split("```json")[1].split("```")[0].strip()
@@ -75,37 +108,21 @@ class Perception:
             output = json.loads(json_block)
 
             # ✅ Patch missing fields for PerceptionSnapshot
-            required_fields = {
-                "entities": [],
-                "result_requirement": "No requirement specified.",
-                "original_goal_achieved": False,
-                "reasoning": "No reasoning given.",
-                "local_goal_achieved": False,
-                "local_reasoning": "No local reasoning given.",
-                "last_tooluse_summary": "None",
-                "solution_summary": "No summary.",
-                "confidence": "0.0"
-            }
-
-            for key, default in required_fields.items():
+            defaulted = [key for key in REQUIRED_FIELDS if key not in output]
+            for key, default in REQUIRED_FIELDS.items():
                 output.setdefault(key, default)
 
+            if cacheable and not defaulted:
+                await self.cache.put("perception", prefix_key, perception_input, output, similarity_text)
             return output
 
         except Exception as e:
-            # Optional: log to disk for inspection
-            import pdb; pdb.set_trace()
-
             print("❌ EXCEPTION IN PERCEPTION:", e)
-            return {
-                "entities": [],
-                "result_requirement": "N/A",
-                "original_goal_achieved": False,
-                "reasoning": "Perception failed to parse model output as JSON.",
-                "local_goal_achieved": False,
-                "local_reasoning": "Could not extract structured information.",
-                "solution_summary": "Not ready yet",
-                "confidence": "0.0"
-            }
+            return fallback_perception(
+                result_requirement="N/A",
+                reasoning="Perception failed to parse model output as JSON.",
+                local_reasoning="Could not extract structured information.",
+                solution_summary="Not ready yet"
+            )
 
 
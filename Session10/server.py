@@ -0,0 +1,190 @@
+"""
+Concurrent front end for the agent: many AgentLoop.run sessions share one MultiMCP and
+one LLM gateway, each with its own AgentSession and session memory.
+
+    POST /query      {"query": "..."}  → final session state
+    WS   /ws         send {"query": "..."} messages, receive accepted/result events
+    GET  /metrics    active sessions, queue depth, completed and rejected counts
+
+Run from Session10/:  python server.py
+"""
+import asyncio
+import yaml
+import uvicorn
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from mcp_servers.multiMCP import MultiMCP
+from agent.agent_loop2 import AgentLoop
+from agent.llm_gateway import get_gateway
+
+PROFILE_YAML = "config/profiles.yaml"
+MCP_CONFIG_YAML = "config/mcp_server_config.yaml"
+
+DEFAULT_SETTINGS = {
+    "host": "127.0.0.1",
+    "port": 8000,
+    "max_active_sessions": 8,
+    "max_queued_sessions": 32,
+}
+
+
+class Overloaded(Exception):
+    pass
+
+
+class AdmissionControl:
+    """Caps concurrently running sessions and how many may wait for a free slot."""
+
+    def __init__(self, max_active: int, max_queued: int):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self._slots = asyncio.Semaphore(max_active)
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.active >= self.max_active and self.queued >= self.max_queued:
+            self.rejected += 1
+            raise Overloaded(f"{self.active} sessions running and {self.queued} queued")
+
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._slots.release()
+
+    def metrics(self) -> dict:
+        return {
+            "active_sessions": self.active,
+            "queue_depth": self.queued,
+            "completed_sessions": self.completed,
+            "rejected_sessions": self.rejected,
+            "max_active_sessions": self.max_active,
+            "max_queued_sessions": self.max_queued,
+        }
+
+
+def load_settings() -> dict:
+    with open(PROFILE_YAML, "r") as f:
+        profile = yaml.safe_load(f) or {}
+    return {**DEFAULT_SETTINGS, **(profile.get("server") or {})}
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    settings = load_settings()
+    print("Loading MCP Servers...")
+    with open(MCP_CONFIG_YAML, "r") as f:
+        configs = list((yaml.safe_load(f) or {}).get("mcp_servers", []))
+
+    multi_mcp = MultiMCP(server_configs=configs)
+    await multi_mcp.initialize()
+
+    app.state.admission = AdmissionControl(settings["max_active_sessions"], settings["max_queued_sessions"])
+    app.state.loop = AgentLoop(
+        perception_prompt_path="prompts/perception_prompt.txt",
+        decision_prompt_path="prompts/decision_prompt.txt",
+        multi_mcp=multi_mcp,
+        strategy="exploratory",
+        stream=True,
+        speculative=True
+    )
+    try:
+        yield
+    finally:
+        await multi_mcp.shutdown()
+        await get_gateway().aclose()
+
+
+async def run_session(app: Starlette, query: str) -> dict:
+    async with app.state.admission.slot():
+        session = await app.state.loop.run(query)
+    return {
+        "session_id": session.session_id,
+        "query": session.original_query,
+        "state": session.state,
+    }
+
+
+async def query_endpoint(request: Request):
+    body = await request.json()
+    query = (body.get("query") or "").strip()
+    if not query:
+        return JSONResponse({"error": "Missing 'query'"}, status_code=400)
+    try:
+        return JSONResponse(await run_session(request.app, query))
+    except Overloaded as e:
+        return JSONResponse({"error": f"Server busy: {e}"}, status_code=503, headers={"Retry-After": "5"})
+
+
+async def websocket_endpoint(websocket: WebSocket):
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+    tasks = set()
+
+    async def send(message: dict):
+        async with send_lock:
+            await websocket.send_json(message)
+
+    async def handle(request_id, query: str):
+        try:
+            await send({"event": "result", "id": request_id, **(await run_session(websocket.app, query))})
+        except Overloaded as e:
+            await send({"event": "rejected", "id": request_id, "error": f"Server busy: {e}"})
+        except Exception as e:
+            await send({"event": "error", "id": request_id, "error": f"{type(e).__name__}: {e}"})
+
+    try:
+        while True:
+            message = await websocket.receive_json()
+            query = (message.get("query") or "").strip()
+            if not query:
+                await send({"event": "error", "id": message.get("id"), "error": "Missing 'query'"})
+                continue
+            await send({"event": "accepted", "id": message.get("id"), **websocket.app.state.admission.metrics()})
+            task = asyncio.create_task(handle(message.get("id"), query))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Whatever ended the loop, stop this connection's sessions and wait for them to
+        # leave admission control, so /metrics does not count them as running or queued
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def metrics_endpoint(request: Request):
+    return JSONResponse(request.app.state.admission.metrics())
+
+
+app = Starlette(
+    routes=[
+        Route("/query", query_endpoint, methods=["POST"]),
+        WebSocketRoute("/ws", websocket_endpoint),
+        Route("/metrics", metrics_endpoint, methods=["GET"]),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    settings = load_settings()
+    uvicorn.run(app, host=settings["host"], port=settings["port"])
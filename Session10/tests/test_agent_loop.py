@@ -0,0 +1,118 @@
+"""
+AgentLoop when the LLM is unavailable: gateway timeouts and failed speculative
+decisions must degrade the session (fallback perception, NOP, replanned steps or a
+fresh decision), never crash it.
+
+Run from Session10/:
+    python -m pytest -q
+"""
+import asyncio
+import json
+
+import pytest
+
+from agent import llm_cache, llm_gateway, tracing
+from agent.agent_loop2 import AgentLoop
+from agent.agentSession import PerceptionSnapshot
+from agent.llm_gateway import DEFAULT_SETTINGS, LLMGateway
+from benchmarks.agent_bench import DECISION_PROMPT, PERCEPTION_PROMPT
+from benchmarks.scenarios import math_chain
+from benchmarks.stubs import FakeMultiMCP, ReplayScript, ScriptedLLM, current_script
+
+
+class HangingLLM(ScriptedLLM):
+    """Never answers the prompts `hangs(payload)` selects, so the gateway times out on them."""
+
+    def __init__(self, hangs=lambda payload: True):
+        super().__init__()
+        self.hangs = hangs
+        self.timeouts = 0
+
+    async def generate(self, model: str, prompt: str, **options) -> str:
+        payload = json.loads(prompt.rsplit("```json", 1)[1].split("```")[0])
+        if self.hangs(payload):
+            self.timeouts += 1
+            await asyncio.sleep(3600)
+        return await super().generate(model, prompt, **options)
+
+
+class FailingLLM(ScriptedLLM):
+    """Raises a non-retryable error for the first `failures` prompts `fails(payload)` selects."""
+
+    def __init__(self, fails, failures: int = 1):
+        super().__init__()
+        self.fails = fails
+        self.failures = failures
+
+    async def generate(self, model: str, prompt: str, **options) -> str:
+        payload = json.loads(prompt.rsplit("```json", 1)[1].split("```")[0])
+        if self.failures and self.fails(payload):
+            self.failures -= 1
+            raise RuntimeError("provider rejected the request")
+        return await super().generate(model, prompt, **options)
+
+
+@pytest.fixture
+def run_agent(tmp_path, monkeypatch):
+    """Run one AgentLoop session against `llm` with a fast-failing gateway and no side effects."""
+    monkeypatch.chdir(tmp_path)  # session logs and memory search resolve relative to the cwd
+    monkeypatch.setattr(llm_cache, "_cache", None)
+    monkeypatch.setattr(llm_cache, "_loaded", True)
+    monkeypatch.setattr(tracing, "_tracer", tracing.Tracer(tmp_path / "spans.jsonl", enabled=False))
+
+    def run(llm: ScriptedLLM, speculative: bool = False):
+        gateway = LLMGateway({**DEFAULT_SETTINGS, "timeout_seconds": 0.05, "max_retries": 0, "backoff_seconds": 0})
+        gateway.register_provider("gemini", llm)
+        monkeypatch.setattr(llm_gateway, "_gateway", gateway)
+
+        async def session():
+            multi_mcp = FakeMultiMCP()
+            await multi_mcp.initialize()
+            script = ReplayScript(math_chain())
+            current_script.set(script)
+            loop = AgentLoop(str(PERCEPTION_PROMPT), str(DECISION_PROMPT), multi_mcp, speculative=speculative)
+            try:
+                return await loop.run(script.query)
+            finally:
+                await gateway.aclose()
+
+        return asyncio.run(session())
+
+    return run
+
+
+def test_timeouts_everywhere_end_in_clarification(run_agent):
+    llm = HangingLLM()
+    session = run_agent(llm)
+
+    assert llm.timeouts == 2  # initial perception, initial decision
+    snapshot = session.perception
+    assert isinstance(snapshot, PerceptionSnapshot)
+    assert not snapshot.original_goal_achieved
+    step = session.plan_versions[-1]["steps"][-1]
+    assert step.type == "NOP"
+    assert step.status == "clarification_needed"
+
+
+def test_step_perception_timeout_replans(run_agent):
+    llm = HangingLLM(hangs=lambda payload: payload.get("snapshot_type") == "step_result")
+    session = run_agent(llm)
+
+    assert llm.timeouts > 0
+    code_steps = [s for v in session.plan_versions for s in v["steps"] if s.type == "CODE"]
+    assert code_steps
+    for step in code_steps:
+        assert isinstance(step.perception, PerceptionSnapshot)
+        assert not step.perception.local_goal_achieved
+    # Every failed step perception led to a new plan version instead of an exception
+    assert len(session.plan_versions) == len(code_steps) + 1
+
+
+def test_failed_speculation_falls_back_to_a_fresh_decision(run_agent):
+    # The first mid-session decision is the speculative one
+    llm = FailingLLM(fails=lambda payload: payload.get("plan_mode") == "mid_session")
+    session = run_agent(llm, speculative=True)
+
+    assert llm.failures == 0
+    assert session.state["original_goal_achieved"]
+    assert [v["steps"][0].type for v in session.plan_versions] == ["CODE", "CODE", "CODE", "CONCLUDE"]